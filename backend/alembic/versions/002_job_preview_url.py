@@ -0,0 +1,24 @@
+"""Add preview_url to jobs
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Low-resolution preview published before the final renditions
+    op.add_column('jobs', sa.Column('preview_url', sa.String()))
+
+
+def downgrade() -> None:
+    op.drop_column('jobs', 'preview_url')
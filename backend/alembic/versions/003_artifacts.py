@@ -0,0 +1,31 @@
+"""Add content-addressed artifacts
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Stored files keyed by the SHA-256 of their content, with upload reference counts
+    op.create_table(
+        'artifacts',
+        sa.Column('sha256', sa.String(64), primary_key=True),
+        sa.Column('url', sa.String(), nullable=False, unique=True, index=True),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('artifacts')
@@ -7,7 +7,7 @@ from app.db.database import get_db
 from app.db.models import User, Job, JobStatus
 from app.api.v1.auth import get_current_user
 from app.services.storage import StorageService
-from app.services.video_processor import VideoProcessor
+from app.services.video_processor import VideoProcessor, RENDER_PROFILES, SUBTITLE_MODES
 from app.tasks.video_generation import process_video_job
 from pydantic import BaseModel, Field, model_validator
 
@@ -20,6 +20,7 @@ class VideoJobResponse(BaseModel):
     progress: int
     image_urls: Optional[List[str]] = None
     video_urls: Optional[dict] = None
+    preview_url: Optional[str] = None
     thumbnail_url: Optional[str] = None
     error_message: Optional[str] = None
     job_metadata: Optional[dict] = None  # Include metadata for intermediate results
@@ -36,6 +37,7 @@ class VideoJobResponse(BaseModel):
                 'progress': data.progress,
                 'image_urls': data.image_urls,
                 'video_urls': data.video_urls,
+                'preview_url': getattr(data, 'preview_url', None),
                 'thumbnail_url': data.thumbnail_url,
                 'error_message': getattr(data, 'error_message', None),
                 'job_metadata': getattr(data, 'job_metadata', None),
@@ -57,6 +59,12 @@ async def create_video_job(
     images: List[UploadFile] = File(...),
     aspect_ratios: str = Form("9:16"),  # Use Form() for form data fields, default to single ratio
     video_provider: str = Form("seedream"),  # Video service provider selection
+    master_render: bool = Form(False),  # Generate one clip per shot and crop the other aspect ratios locally
+    render_profile: str = Form(""),  # draft, preview or final; empty uses the server default
+    subtitle_mode: str = Form(""),  # burn or soft (caption track, no re-encode); empty uses the server default
+    fresh_storyboard: bool = Form(False),  # Write a new storyboard even if these images have a cached one
+    beat_sync: bool = Form(False),  # Snap shot cuts to the music's beats (also on when the server enables it)
+    transitions: bool = Form(False),  # Cross-fade between shots as the storyboard suggests (also on when the server enables it)
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -73,17 +81,33 @@ async def create_video_job(
     if len(images) > 10:
         raise HTTPException(status_code=400, detail="Maximum 10 images allowed")
     
-    # Upload images to S3
-    storage = StorageService()
-    image_urls = []
+    # Validate render profile
+    if render_profile and render_profile not in RENDER_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Invalid render profile: {render_profile}")
     
+    # Validate subtitle mode
+    if subtitle_mode and subtitle_mode not in SUBTITLE_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid subtitle mode: {subtitle_mode}")
+    
+    # Validate file types before storing anything: every stored image holds a reference
+    # that only deleting its job releases
     for image in images:
-        # Validate file type
         if not image.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail=f"Invalid file type: {image.content_type}")
-        
-        url = await storage.upload_file(image.file, f"uploads/{current_user.id}/{image.filename}")
-        image_urls.append(url)
+    
+    # Upload images to S3
+    storage = StorageService()
+    image_urls = []
+    image_hashes = []  # Content hashes: cache keys for work derived from the images
+    
+    try:
+        for image in images:
+            stored = await storage.store_file(image.file, f"uploads/{current_user.id}/{image.filename}")
+            image_urls.append(stored["url"])
+            image_hashes.append(stored["sha256"])
+    except Exception:
+        await _release_files(storage, image_urls)
+        raise
     
     # Parse aspect ratios
     aspect_ratio_list = [ar.strip() for ar in aspect_ratios.split(",")]
@@ -93,16 +117,35 @@ async def create_video_job(
     if video_provider not in valid_providers:
         video_provider = "seedream"  # Default to seedream if invalid
     
+    options = {"video_provider": video_provider, "master_render": master_render}  # Store provider in options
+    if render_profile:
+        options["render_profile"] = render_profile
+    if subtitle_mode:
+        options["subtitle_mode"] = subtitle_mode
+    if fresh_storyboard:
+        options["fresh_storyboard"] = True
+    if beat_sync:
+        options["beat_sync"] = True
+    if transitions:
+        options["transitions"] = True
+    
     # Create job
     job = Job(
         user_id=current_user.id,
         status=JobStatus.PENDING,
         image_urls=image_urls,
         aspect_ratios=aspect_ratio_list,
-        options={"video_provider": video_provider}  # Store provider in options
+        options=options,
+        job_metadata={"image_hashes": image_hashes}
     )
-    db.add(job)
-    db.commit()
+    try:
+        db.add(job)
+        db.commit()
+    except Exception:
+        # No job owns the stored images
+        db.rollback()
+        await _release_files(storage, image_urls)
+        raise
     db.refresh(job)
     
     # Deduct credit
@@ -152,6 +195,31 @@ async def list_jobs(
     return jobs
 
 
+async def _release_files(storage: StorageService, urls: List[str]):
+    """Release one storage reference per URL"""
+    for url in urls:
+        await storage.delete_file(url)
+
+
+def _job_file_urls(job: Job) -> List[str]:
+    """Every file the job stored, once per upload (each upload holds one storage reference)"""
+    metadata = job.job_metadata or {}
+    urls = list(job.image_urls or [])
+    # video_urls are the finished subset of the renders
+    urls += list((metadata.get("renders") or job.video_urls or {}).values())
+    urls += list((metadata.get("normalized_clips") or {}).values())
+    urls += [
+        url for url in (
+            metadata.get("thumbnail_url") or job.thumbnail_url,
+            job.preview_url,
+            metadata.get("voiceover_saved"),
+            (metadata.get("audio_mix") or {}).get("url"),
+        )
+        if url
+    ]
+    return urls
+
+
 @router.delete("/{job_id}")
 async def delete_job(
     job_id: UUID,
@@ -163,11 +231,8 @@ async def delete_job(
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    # Delete files from storage
-    storage = StorageService()
-    if job.video_urls:
-        for url in job.video_urls.values():
-            await storage.delete_file(url)
+    # Release the job's files (stored content shared with other jobs stays)
+    await _release_files(StorageService(), _job_file_urls(job))
     
     db.delete(job)
     db.commit()
@@ -40,6 +40,94 @@ class Settings(BaseSettings):
     # Nanobanana
     NANOBANANA_API_KEY: str = ""
     
+    # Celery pipeline: queues for network-bound vs CPU-bound (ffmpeg) stages
+    CELERY_IO_QUEUE: str = "celery"
+    CELERY_CPU_QUEUE: str = "celery"
+    PIPELINE_STAGE_MAX_RETRIES: int = 1
+    PIPELINE_STAGE_RETRY_DELAY: int = 30  # seconds
+    
+    # Max images enhanced/annotated concurrently per job
+    IMAGE_ENHANCEMENT_MAX_CONCURRENCY: int = 4
+    
+    # Provider result caches (see ResultCache): in-process LRU entries per cache, and the
+    # Redis instance holding the shared tier (empty = REDIS_URL)
+    RESULT_CACHE_LOCAL_ENTRIES: int = 1024
+    RESULT_CACHE_REDIS_URL: str = ""
+    # Image enhancement results by (image content, operation, options); seconds, 0 disables.
+    # Keep below the lifetime of the provider's output URLs
+    ENHANCEMENT_CACHE_TTL: int = 7 * 24 * 3600
+    # Storyboards by (ordered image content hashes, product info, prompt version), so an
+    # identical resubmission skips the LLM call; seconds, 0 disables (opt-in). Jobs bypass
+    # it with options["fresh_storyboard"]
+    STORYBOARD_CACHE_TTL: int = 0
+    
+    # Video generation concurrency (max in-flight clip generations per provider)
+    SEEDREAM_MAX_CONCURRENCY: int = 4
+    OPENAI_VIDEO_MAX_CONCURRENCY: int = 2
+    KLING_MAX_CONCURRENCY: int = 3
+    VEO3_MAX_CONCURRENCY: int = 2
+    
+    # Pooled HTTP clients (one keep-alive pool per provider host)
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    HTTP_TIMEOUT: float = 30.0  # seconds, default when a call doesn't set its own
+    # Hosts that negotiate HTTP/2 (comma-separated)
+    HTTP2_HOSTS: str = "api.openai.com,generativelanguage.googleapis.com,api.elevenlabs.io"
+    
+    # Streaming downloads of clips, voiceovers and renders
+    DOWNLOAD_MAX_CONCURRENCY: int = 6
+    DOWNLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes
+    DOWNLOAD_TIMEOUT: float = 120.0  # seconds
+    
+    # Clip normalization on ingest (house mezzanine format at the job's render size, see
+    # VideoProcessor.normalize_clip), so renders that need no picture filtering (soft or
+    # no subtitles, no beat sync or transitions, no master cropping) stream-copy the clips.
+    # Opt-in: it costs a download, an encode and an upload per clip up front
+    CLIP_NORMALIZATION_ENABLED: bool = False
+    CLIP_NORMALIZE_MAX_CONCURRENCY: int = 2
+    
+    # ffmpeg encode scheduling (host-wide): concurrent encodes (0 = cores / 4) and the
+    # directory holding their slot lock files (empty = <tmp>/render-slots)
+    RENDER_MAX_CONCURRENT_ENCODES: int = 0
+    RENDER_SLOT_DIR: str = ""
+    # Encode timelines of at least this many seconds segment-parallel (0 = always one process)
+    RENDER_SEGMENT_MIN_DURATION: float = 60
+    
+    # Minimum seconds between job progress writes while an encode reports progress
+    PROGRESS_UPDATE_INTERVAL: float = 2.0
+    
+    # Default render profile (draft, preview or final; overridable per job via options)
+    RENDER_PROFILE: str = "final"
+    # Publish a low-res preview of the first aspect ratio while the final renders run
+    PREVIEW_ENABLED: bool = True
+    PREVIEW_RENDER_PROFILE: str = "preview"
+    
+    # Precomputed music catalog index (python -m app.services.music_library <tracks dir>);
+    # empty uses MusicSelector's built-in library
+    MUSIC_INDEX_DIR: str = ""
+    
+    # Snap shot cuts to the music's beats at render time (opt-in, or per job via
+    # options["beat_sync"]); beat grids of non-catalog tracks are cached in
+    # BEAT_GRID_CACHE_DIR (empty = <tmp>/beat-grids)
+    BEAT_SYNC_ENABLED: bool = False
+    BEAT_GRID_CACHE_DIR: str = ""
+    
+    # Render the storyboard's shot transitions (fade/dissolve/slide/wipe) instead of hard
+    # cuts (opt-in, or per job via options["transitions"])
+    TRANSITIONS_ENABLED: bool = False
+    
+    # Job audio bed (voiceover + ducked music, loudness-normalized) mixed once per job:
+    # seconds of padding past the storyboard length, renders stop at the end of the picture
+    AUDIO_MIX_TAIL: float = 10.0
+    
+    # Default subtitle mode: "burn" (drawn into the picture) or "soft" (mov_text track,
+    # no extra encode; overridable per job via options)
+    SUBTITLE_MODE: str = "burn"
+    
+    # Default thumbnail frame selection: "first" or "representative" (overridable per job via options)
+    THUMBNAIL_MODE: str = "first"
+    
     # Social Media
     TIKTOK_CLIENT_KEY: str = ""
     TIKTOK_CLIENT_SECRET: str = ""
@@ -65,6 +153,20 @@ class Settings(BaseSettings):
             return [origin.strip() for origin in self.CORS_ORIGINS.split(',') if origin.strip()]
         return self.CORS_ORIGINS if isinstance(self.CORS_ORIGINS, list) else []
     
+    def get_http2_hosts_list(self) -> List[str]:
+        """Parse HTTP2_HOSTS string into a list"""
+        return [host.strip() for host in self.HTTP2_HOSTS.split(',') if host.strip()]
+    
+    def get_video_provider_concurrency(self, provider: str) -> int:
+        """Max number of clips that may be generated concurrently with a video provider"""
+        limits = {
+            "seedream": self.SEEDREAM_MAX_CONCURRENCY,
+            "openai": self.OPENAI_VIDEO_MAX_CONCURRENCY,
+            "kling": self.KLING_MAX_CONCURRENCY,
+            "veo3": self.VEO3_MAX_CONCURRENCY,
+        }
+        return max(1, limits.get(provider, 1))
+    
     class Config:
         # Use absolute path to .env file in backend directory
         env_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".env")
@@ -0,0 +1,72 @@
+import httpx
+from app.core.config import settings
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import asyncio
+import logging
+import weakref
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 - HTTP/2 support for httpx (httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HttpClientRegistry:
+    """
+    Worker-scoped registry of pooled httpx clients, one per provider origin
+    (scheme://host:port), so repeated calls and status polls reuse keep-alive
+    connections instead of paying a new TCP/TLS handshake each time.
+    
+    httpx clients are bound to the event loop they were first used on, so the
+    registry keeps a separate set of clients per running loop.
+    """
+    
+    def __init__(self):
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+    
+    def get(self, url: str) -> httpx.AsyncClient:
+        """Get the pooled client for the origin of url"""
+        loop = asyncio.get_running_loop()
+        clients = self._clients.setdefault(loop, {})
+        origin = self._origin(url)
+        
+        client = clients.get(origin)
+        if client is None or client.is_closed:
+            host = urlsplit(origin).hostname or ""
+            http2 = HTTP2_AVAILABLE and host in settings.get_http2_hosts_list()
+            client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+                ),
+                timeout=settings.HTTP_TIMEOUT
+            )
+            clients[origin] = client
+            logger.info(f"Opened pooled HTTP client for {origin} (http2={http2})")
+        return client
+    
+    async def aclose(self):
+        """Close every client opened on the running loop"""
+        clients = self._clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+    
+    def _origin(self, url: str) -> str:
+        parts = urlsplit(url)
+        if not parts.scheme or not parts.netloc:
+            raise ValueError(f"Cannot pool HTTP client for relative URL: {url}")
+        return f"{parts.scheme}://{parts.netloc}"
+
+
+http_clients = HttpClientRegistry()
+
+
+def get_http_client(url: str, client: Optional[httpx.AsyncClient] = None) -> httpx.AsyncClient:
+    """Return the injected client if given, otherwise the pooled client for url's origin"""
+    return client or http_clients.get(url)
@@ -0,0 +1,115 @@
+import redis
+from app.core.config import settings
+from collections import OrderedDict
+from typing import Any, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Redis calls give up quickly: a slow or missing cache must never stall a job
+REDIS_SOCKET_TIMEOUT = 0.5  # seconds
+
+
+class ResultCache:
+    """
+    Two-tier cache of JSON-serializable results of expensive provider calls.
+    
+    Front tier: an in-process LRU of max_entries results, shared by every job in
+    the process. Back tier: Redis (RESULT_CACHE_REDIS_URL, default REDIS_URL), shared
+    by every worker; its size bound is the server's maxmemory with an LRU eviction
+    policy (e.g. allkeys-lru). Entries expire from both tiers ttl seconds after they
+    were cached (ttl 0 disables the cache).
+    
+    Best effort: Redis errors are logged and treated as misses.
+    Keys are the SHA-256 of the JSON-encoded key parts, under namespace.
+    """
+    
+    def __init__(self, namespace: str, ttl: int, max_entries: int = 0):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries or settings.RESULT_CACHE_LOCAL_ENTRIES
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._redis: Optional[redis.Redis] = None
+    
+    @property
+    def redis(self) -> redis.Redis:
+        """Connection-pooled sync client (calls run in threads, so it works on any event loop)"""
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(
+                settings.RESULT_CACHE_REDIS_URL or settings.REDIS_URL,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_SOCKET_TIMEOUT
+            )
+        return self._redis
+    
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+    
+    def key(self, *parts) -> str:
+        """Cache key of the key parts (any JSON-serializable values)"""
+        digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{self.namespace}:{digest}"
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Cached result for key, None on a miss"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._local.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._local.move_to_end(key)
+                return entry[1]
+            self._local.pop(key, None)
+        
+        try:
+            payload, remaining = await asyncio.to_thread(self._fetch, key)
+        except redis.RedisError as e:
+            logger.warning(f"Result cache read failed for {key}: {str(e)}")
+            return None
+        if payload is None:
+            return None
+        
+        value = json.loads(payload)
+        # The local copy expires with the Redis entry
+        self._remember(key, value, remaining if remaining > 0 else self.ttl)
+        return value
+    
+    async def set(self, key: str, value: Any) -> None:
+        """Cache a result in both tiers"""
+        if not self.enabled:
+            return
+        self._remember(key, value, self.ttl)
+        try:
+            await asyncio.to_thread(self.redis.set, key, json.dumps(value), ex=self.ttl)
+        except redis.RedisError as e:
+            logger.warning(f"Result cache write failed for {key}: {str(e)}")
+    
+    async def delete(self, key: str) -> None:
+        """Drop a cached result from both tiers"""
+        with self._lock:
+            self._local.pop(key, None)
+        try:
+            await asyncio.to_thread(self.redis.delete, key)
+        except redis.RedisError as e:
+            logger.warning(f"Result cache delete failed for {key}: {str(e)}")
+    
+    def _fetch(self, key: str) -> tuple:
+        """(payload, seconds to expiry) in one round trip"""
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.get(key)
+        pipeline.ttl(key)
+        return tuple(pipeline.execute())
+    
+    def _remember(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._local[key] = (time.monotonic() + ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, JSON, Enum, ForeignKey, Text
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, JSON, Enum, ForeignKey, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -50,6 +50,7 @@ class Job(Base):
     # Output
     video_urls = Column(JSON)  # Dict: {"9:16": "url", "1:1": "url", ...}
     thumbnail_url = Column(String)
+    preview_url = Column(String)  # Low-res preview of the first aspect ratio, published before video_urls
     
     # Metadata
     job_metadata = Column("metadata", JSON, default={})  # Storyboard, subtitles, etc.
@@ -62,3 +63,13 @@ class Job(Base):
     user = relationship("User", back_populates="jobs")
 
 
+class Artifact(Base):
+    """A stored file, addressed by the SHA-256 of its bytes (see StorageService)"""
+    __tablename__ = "artifacts"
+    
+    sha256 = Column(String(64), primary_key=True)
+    url = Column(String, unique=True, index=True, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, default=0, nullable=False)  # Uploads not yet released with delete_file
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
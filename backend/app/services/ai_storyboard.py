@@ -1,6 +1,8 @@
 from openai import OpenAI
 from app.core.config import settings
-from typing import List, Dict
+from app.core.http_clients import get_http_client
+from app.core.result_cache import ResultCache
+from typing import List, Dict, Optional
 import json
 import logging
 import base64
@@ -10,15 +12,26 @@ logger = logging.getLogger(__name__)
 
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
+# Part of every storyboard cache key: bump when the prompt or model changes
+STORYBOARD_PROMPT_VERSION = 2
+
+# Storyboards by (ordered image content hashes, product info, prompt version); opt-in
+# via STORYBOARD_CACHE_TTL
+storyboard_cache = ResultCache("storyboard", ttl=settings.STORYBOARD_CACHE_TTL)
+
 
 class StoryboardService:
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, cache: Optional[ResultCache] = None):
         self.client = client
+        self.http_client = http_client
+        self.cache = cache or storyboard_cache
     
     async def generate_storyboard(
         self,
         image_urls: List[str],
-        product_info: Dict = None
+        product_info: Dict = None,
+        image_hashes: Optional[List[str]] = None,
+        fresh: bool = False
     ) -> Dict:
         """
         Generate storyboard with shot breakdown, subtitles, hook, selling points, and CTA.
@@ -28,9 +41,22 @@ class StoryboardService:
         - Text/subtitle
         - Suggested duration
         - Hook, product selling points, CTA
+        
+        With the content hashes of every image (image_hashes, in order) the storyboard is
+        cached, and an identical resubmission reuses it; fresh skips the cached one (and
+        replaces it with the new storyboard).
         """
         logger.info(f"Generating storyboard for {len(image_urls)} images")
         
+        cache_key = None
+        if self.cache.enabled and image_hashes and len(image_hashes) == len(image_urls) and all(image_hashes):
+            cache_key = self.cache.key(STORYBOARD_PROMPT_VERSION, list(image_hashes), product_info or {})
+        if cache_key and not fresh:
+            cached = await self.cache.get(cache_key)
+            if cached:
+                logger.info(f"Using cached storyboard with {len(cached.get('shots', []))} shots")
+                return cached
+                
         # Create image reference map for the prompt
         image_refs = "\n".join([f"Image {i+1}: {url}" for i, url in enumerate(image_urls)])
         
@@ -51,6 +77,7 @@ Create a storyboard with 3-6 shots. For each shot, you MUST provide:
 5. hook: Boolean indicating if this is the hook (first 3 seconds - attention-grabbing)
 6. selling_points: Array of key product features/benefits to highlight (extracted from shot)
 7. cta: Call-to-action text for the end (only the last shot should have this, others should be empty string)
+8. transition: How this shot leads into the next one: "cut", "fade", "dissolve", "slide" or "wipe" (the last shot should use "cut")
 
 IMPORTANT: 
 - The first shot MUST have hook: true
@@ -68,7 +95,8 @@ Return ONLY valid JSON in this exact format:
             "duration": 3,
             "hook": true,
             "selling_points": ["Premium quality", "Innovative design"],
-            "cta": ""
+            "cta": "",
+            "transition": "fade"
         }},
         {{
             "shot_number": 2,
@@ -77,7 +105,8 @@ Return ONLY valid JSON in this exact format:
             "duration": 4,
             "hook": false,
             "selling_points": ["Durable materials", "Long warranty"],
-            "cta": ""
+            "cta": "",
+            "transition": "cut"
         }},
         {{
             "shot_number": 3,
@@ -86,7 +115,8 @@ Return ONLY valid JSON in this exact format:
             "duration": 3,
             "hook": false,
             "selling_points": ["Limited time offer"],
-            "cta": "Shop Now - Link in Bio"
+            "cta": "Shop Now - Link in Bio",
+            "transition": "cut"
         }}
     ],
     "hook_text": "Attention-grabbing opening text",
@@ -113,57 +143,57 @@ Return ONLY valid JSON in this exact format:
             if image_urls:
                 content_with_images = [{"type": "text", "text": prompt}]
                 # Limit to 4 images for API (GPT-4 Vision supports up to 10, but we'll be conservative)
-                async with httpx.AsyncClient() as http_client:
-                    for img_url in image_urls[:4]:
-                        # Always convert to base64 for localhost URLs (OpenAI can't access localhost)
-                        if "localhost" in img_url or "127.0.0.1" in img_url or img_url.startswith("/local_storage"):
-                            try:
-                                # If it's a relative path, make it absolute
-                                if img_url.startswith("/local_storage"):
-                                    from app.core.config import settings
-                                    img_url = f"{settings.API_BASE_URL}{img_url}"
-                                
-                                # Download image and convert to base64
-                                logger.info(f"Converting local image to base64: {img_url}")
-                                response = await http_client.get(img_url, timeout=10.0)
-                                response.raise_for_status()
-                                image_data = response.content
-                                base64_image = base64.b64encode(image_data).decode('utf-8')
-                                
-                                # Determine image format from URL or content type
-                                content_type = response.headers.get('content-type', '')
-                                if not content_type:
-                                    # Guess from URL
-                                    if img_url.lower().endswith('.png'):
-                                        mime_type = 'image/png'
-                                    elif img_url.lower().endswith('.gif'):
-                                        mime_type = 'image/gif'
-                                    else:
-                                        mime_type = 'image/jpeg'
-                                elif 'png' in content_type.lower():
+                for img_url in image_urls[:4]:
+                    # Always convert to base64 for localhost URLs (OpenAI can't access localhost)
+                    if "localhost" in img_url or "127.0.0.1" in img_url or img_url.startswith("/local_storage"):
+                        try:
+                            # If it's a relative path, make it absolute
+                            if img_url.startswith("/local_storage"):
+                                from app.core.config import settings
+                                img_url = f"{settings.API_BASE_URL}{img_url}"
+                            
+                            # Download image and convert to base64
+                            logger.info(f"Converting local image to base64: {img_url}")
+                            http_client = get_http_client(img_url, self.http_client)
+                            response = await http_client.get(img_url, timeout=10.0)
+                            response.raise_for_status()
+                            image_data = response.content
+                            base64_image = base64.b64encode(image_data).decode('utf-8')
+                            
+                            # Determine image format from URL or content type
+                            content_type = response.headers.get('content-type', '')
+                            if not content_type:
+                                # Guess from URL
+                                if img_url.lower().endswith('.png'):
                                     mime_type = 'image/png'
-                                elif 'gif' in content_type.lower():
+                                elif img_url.lower().endswith('.gif'):
                                     mime_type = 'image/gif'
                                 else:
                                     mime_type = 'image/jpeg'
-                                
-                                # Use base64 format for localhost images
-                                content_with_images.append({
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:{mime_type};base64,{base64_image}"
-                                    }
-                                })
-                                logger.info(f"Successfully converted image to base64 (size: {len(base64_image)} chars)")
-                            except Exception as e:
-                                logger.error(f"Failed to convert local image to base64: {str(e)}", exc_info=True)
-                                raise Exception(f"Failed to load image for storyboard generation: {str(e)}")
-                        else:
-                            # Use URL directly for public URLs
+                            elif 'png' in content_type.lower():
+                                mime_type = 'image/png'
+                            elif 'gif' in content_type.lower():
+                                mime_type = 'image/gif'
+                            else:
+                                mime_type = 'image/jpeg'
+                            
+                            # Use base64 format for localhost images
                             content_with_images.append({
                                 "type": "image_url",
-                                "image_url": {"url": img_url}
+                                "image_url": {
+                                    "url": f"data:{mime_type};base64,{base64_image}"
+                                }
                             })
+                            logger.info(f"Successfully converted image to base64 (size: {len(base64_image)} chars)")
+                        except Exception as e:
+                            logger.error(f"Failed to convert local image to base64: {str(e)}", exc_info=True)
+                            raise Exception(f"Failed to load image for storyboard generation: {str(e)}")
+                    else:
+                        # Use URL directly for public URLs
+                        content_with_images.append({
+                            "type": "image_url",
+                            "image_url": {"url": img_url}
+                        })
                 messages[1]["content"] = content_with_images
             
             logger.info("Calling OpenAI API for storyboard generation")
@@ -195,6 +225,8 @@ Return ONLY valid JSON in this exact format:
                         raise ValueError(f"Invalid storyboard format: shot {i+1} missing '{field}'")
             
             logger.info(f"Successfully generated storyboard with {len(storyboard['shots'])} shots")
+            if cache_key:
+                await self.cache.set(cache_key, storyboard)
             return storyboard
             
         except json.JSONDecodeError as e:
@@ -223,7 +255,8 @@ Return ONLY valid JSON in this exact format:
             current_time += shot.get("duration", 5)
         
         return subtitles
-
-
-
-
+    
+    def generate_transitions(self, storyboard: Dict) -> List[str]:
+        """Transition from each shot into the next (one per cut, "cut" when the storyboard has none)"""
+        shots = storyboard.get("shots", [])
+        return [shot.get("transition") or "cut" for shot in shots[:-1]]
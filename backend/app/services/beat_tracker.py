@@ -0,0 +1,208 @@
+import ffmpeg
+import numpy as np
+import hashlib
+import json
+import os
+import tempfile
+import logging
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.render_scheduler import render_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Mono PCM rate tracks are analysed at
+ANALYSIS_SAMPLE_RATE = 22050
+# STFT window and hop (samples): ~93ms windows, ~43 onset frames per second
+STFT_SIZE = 2048
+STFT_HOP = 512
+# STFT frames transformed per batch, bounds memory on long tracks
+STFT_BATCH_FRAMES = 1024
+
+# Tempo search range and the log-gaussian prior that breaks octave ties (half/double tempo)
+TEMPO_RANGE = (60, 200)  # BPM
+TEMPO_PRIOR_BPM = 120
+TEMPO_PRIOR_OCTAVES = 1.0
+
+# Cut snapping: shortest shot a snap may leave, and the longest a clip may be held on
+# its last frame to reach a later beat
+MIN_SHOT_DURATION = 1.0  # seconds
+MAX_CUT_HOLD = 0.5  # seconds
+
+
+class BeatTracker:
+    """
+    Onset and beat tracker: STFT spectral flux onset envelope, autocorrelation tempo
+    estimate, then the beat grid at that tempo best aligned with the onsets.
+    Vectorized with NumPy, a three-minute track analyses in well under a second.
+    
+    beat_grid() caches results per track (JSON files in cache_dir), so a catalog
+    track is analysed once and reused by every job that picks it.
+    """
+    
+    def __init__(self, cache_dir: str = ""):
+        self.cache_dir = cache_dir or settings.BEAT_GRID_CACHE_DIR or os.path.join(tempfile.gettempdir(), "beat-grids")
+    
+    async def beat_grid(self, track_url: str) -> Dict:
+        """Cached {"bpm", "beats"} (beat times in seconds) for a music track path or URL"""
+        cache_path = os.path.join(self.cache_dir, f"{hashlib.sha256(track_url.encode()).hexdigest()}.json")
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as f:
+                return json.load(f)
+        
+        grid = await self.analyze_file(track_url)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write then rename, so a concurrent reader never sees a partial file
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(grid, f)
+        os.replace(tmp_path, cache_path)
+        logger.info(f"Cached beat grid for {track_url}: {grid['bpm']} BPM, {len(grid['beats'])} beats")
+        return grid
+    
+    async def analyze_file(self, audio_path: str) -> Dict:
+        """Decode a track to mono PCM and track its beats"""
+        fd, pcm_path = tempfile.mkstemp(suffix=".f32")
+        os.close(fd)
+        try:
+            await render_scheduler.run(
+                ffmpeg.input(audio_path).output(
+                    pcm_path, format="f32le", acodec="pcm_f32le", ar=ANALYSIS_SAMPLE_RATE, ac=1
+                )
+            )
+            return self.track(np.fromfile(pcm_path, dtype="<f4"))
+        finally:
+            os.remove(pcm_path)
+    
+    def track(self, samples: np.ndarray) -> Dict:
+        """Tempo (BPM, None if no pulse was found) and beat times (seconds) of mono PCM at ANALYSIS_SAMPLE_RATE"""
+        envelope = self.onset_envelope(samples)
+        frame_rate = ANALYSIS_SAMPLE_RATE / STFT_HOP
+        period = self.estimate_period(envelope, frame_rate)
+        if period is None:
+            return {"bpm": None, "beats": []}
+        
+        frames = self._place_beats(envelope, period)
+        # Envelope frame i is the flux into STFT frame i + 1; time it at that window's center
+        times = ((frames + 1) * STFT_HOP + STFT_SIZE / 2) / ANALYSIS_SAMPLE_RATE
+        return {
+            "bpm": round(60 * frame_rate / period, 2),
+            "beats": times.round(3).tolist(),
+        }
+    
+    def onset_envelope(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Spectral flux: summed increase of log-magnitude per STFT frame, with the local
+        mean (~1s) removed so only onsets stand out, scaled to 0-1
+        """
+        if len(samples) < STFT_SIZE * 2:
+            return np.zeros(0, dtype=np.float32)
+        
+        frames = np.lib.stride_tricks.sliding_window_view(samples.astype(np.float32), STFT_SIZE)[::STFT_HOP]
+        window = np.hanning(STFT_SIZE).astype(np.float32)
+        spectrum = np.concatenate([
+            np.log1p(100 * np.abs(np.fft.rfft(frames[i:i + STFT_BATCH_FRAMES] * window, axis=1))).astype(np.float32)
+            for i in range(0, len(frames), STFT_BATCH_FRAMES)
+        ])
+        flux = np.maximum(np.diff(spectrum, axis=0), 0).sum(axis=1)
+        
+        width = int(ANALYSIS_SAMPLE_RATE / STFT_HOP)
+        trend = np.convolve(flux, np.ones(width) / width, mode="same")
+        envelope = np.maximum(flux - trend, 0)
+        peak = envelope.max()
+        return envelope / peak if peak > 0 else envelope
+    
+    def estimate_period(self, envelope: np.ndarray, frame_rate: float) -> Optional[float]:
+        """Beat period in envelope frames: the autocorrelation peak in TEMPO_RANGE, weighted by the tempo prior"""
+        n = len(envelope)
+        if not n or not envelope.any():
+            return None
+        
+        centered = envelope - envelope.mean()
+        autocorrelation = np.fft.irfft(np.abs(np.fft.rfft(centered, 2 * n)) ** 2)[:n]
+        min_lag = max(1, int(60 * frame_rate / TEMPO_RANGE[1]))
+        max_lag = min(n - 2, int(np.ceil(60 * frame_rate / TEMPO_RANGE[0])))
+        if max_lag <= min_lag:
+            return None
+        
+        lags = np.arange(min_lag, max_lag + 1)
+        prior = np.exp(-0.5 * (np.log2(60 * frame_rate / lags / TEMPO_PRIOR_BPM) / TEMPO_PRIOR_OCTAVES) ** 2)
+        scores = autocorrelation[lags] * prior
+        best = int(np.argmax(scores))
+        if scores[best] <= 0:
+            return None
+        
+        # Re-measure on ever further multiples of the lag (2x, 4x, ... up to a quarter of
+        # the track): each peak pins the period down finer, so the grid doesn't drift
+        # off the beat over a whole track
+        period = float(lags[best])
+        radius = max(1, int(period / 3))
+        k = 1
+        while (2 * k) * period < n / 4:
+            k *= 2
+            expected = int(round(k * period))
+            search = np.arange(max(1, expected - radius), min(n - 1, expected + radius + 1))
+            peak = int(search[np.argmax(autocorrelation[search])])
+            # Parabolic interpolation around the peak for a sub-frame position
+            left, center, right = autocorrelation[peak - 1:peak + 2]
+            curvature = left - 2 * center + right
+            offset = 0.5 * (left - right) / curvature if curvature < 0 else 0.0
+            period = (peak + offset) / k
+        return period
+    
+    def _place_beats(self, envelope: np.ndarray, period: float) -> np.ndarray:
+        """
+        Envelope frames of the beats: the evenly spaced grid (every phase scored at once)
+        with the most onset energy, each beat then moved to the strongest onset within
+        a tenth of a period to follow small tempo drift
+        """
+        n = len(envelope)
+        count = int((n - 1) // period) + 1
+        phases = np.arange(int(np.ceil(period)))
+        positions = np.rint(phases[:, None] + np.arange(count)[None, :] * period).astype(int)
+        in_track = positions < n
+        scores = np.where(in_track, envelope[np.minimum(positions, n - 1)], 0).sum(axis=1)
+        best = int(np.argmax(scores))
+        beats = positions[best][in_track[best]]
+        
+        radius = max(1, int(period / 10))
+        windows = np.lib.stride_tricks.sliding_window_view(np.pad(envelope, radius), 2 * radius + 1)
+        return beats + windows[beats].argmax(axis=1) - radius
+
+
+def snap_cuts_to_beats(
+    durations: List[float],
+    beats: List[float],
+    min_shot: float = MIN_SHOT_DURATION,
+    max_hold: float = MAX_CUT_HOLD
+) -> List[float]:
+    """
+    Clip durations that put every cut between shots on the beat nearest its original
+    timeline position: a clip is trimmed, or held on its last frame for up to max_hold
+    seconds, and keeps at least min_shot seconds. A cut without a beat in reach stays
+    where it is; the last clip keeps its full length.
+    """
+    beats = np.asarray(beats, dtype=float)
+    snapped = []
+    start = 0.0  # snapped position of the current clip
+    cut = 0.0  # original position of the current cut
+    for i, duration in enumerate(durations):
+        cut += duration
+        if i == len(durations) - 1 or not len(beats):
+            snapped.append(duration)
+            start += duration
+            continue
+        
+        lo = np.searchsorted(beats, start + min_shot, side="left")
+        hi = np.searchsorted(beats, start + duration + max_hold, side="right")
+        snapped_cut = start + duration
+        if lo < hi:
+            candidates = beats[lo:hi]
+            snapped_cut = float(candidates[np.argmin(np.abs(candidates - cut))])
+        snapped.append(round(snapped_cut - start, 3))
+        start = snapped_cut
+    return snapped
+
+
+# Shared by every job in the worker process
+beat_tracker = BeatTracker()
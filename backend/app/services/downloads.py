@@ -0,0 +1,70 @@
+import httpx
+from app.core.config import settings
+from app.core.http_clients import get_http_client
+from typing import List, Optional, Tuple
+import asyncio
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadService:
+    """
+    Streams remote files (provider clips, saved voiceovers, renders) to disk in
+    fixed-size chunks, so memory use stays flat regardless of file size
+    """
+    
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        self.client = client
+        self.chunk_size = settings.DOWNLOAD_CHUNK_SIZE
+        self.max_concurrency = max(1, settings.DOWNLOAD_MAX_CONCURRENCY)
+    
+    async def download_to_file(self, url: str, path: str) -> str:
+        """
+        Download url to path and verify the byte count against Content-Length
+        Returns the local path
+        """
+        if url.startswith("/local_storage"):
+            url = f"{settings.API_BASE_URL}{url}"
+        client = get_http_client(url, self.client)
+        
+        # Write to a sibling temp file so a failed download never leaves a truncated file behind
+        partial_path = f"{path}.part"
+        try:
+            async with client.stream("GET", url, timeout=settings.DOWNLOAD_TIMEOUT, follow_redirects=True) as response:
+                response.raise_for_status()
+                expected = response.headers.get("content-length")
+                # Content-Length counts encoded bytes, so it can only be checked for identity responses
+                if response.headers.get("content-encoding", "identity") != "identity":
+                    expected = None
+                
+                written = 0
+                with open(partial_path, "wb") as f:
+                    async for chunk in response.aiter_bytes(self.chunk_size):
+                        f.write(chunk)
+                        written += len(chunk)
+            
+            if expected is not None and written != int(expected):
+                raise Exception(f"Incomplete download: got {written} of {expected} bytes")
+            
+            os.replace(partial_path, path)
+            logger.info(f"Downloaded {written} bytes from {url}")
+            return path
+        except Exception as e:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise Exception(f"Failed to download {url}: {str(e)}")
+    
+    async def download_all(self, downloads: List[Tuple[str, str]]) -> List[str]:
+        """
+        Download (url, path) pairs concurrently, bounded by DOWNLOAD_MAX_CONCURRENCY
+        Returns local paths in the same order as downloads
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def download(url: str, path: str) -> str:
+            async with semaphore:
+                return await self.download_to_file(url, path)
+        
+        return await asyncio.gather(*(download(url, path) for url, path in downloads))
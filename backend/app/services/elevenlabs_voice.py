@@ -1,13 +1,20 @@
 import httpx
 from app.core.config import settings
+from app.core.http_clients import get_http_client
 from typing import Optional
 import base64
 
 
 class ElevenLabsVoiceService:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.api_key = settings.ELEVENLABS_API_KEY
         self.base_url = "https://api.elevenlabs.io/v1"
+        self._client = client
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client for the provider API (or the injected one)"""
+        return get_http_client(self.base_url, self._client)
     
     async def generate_voiceover(
         self,
@@ -22,26 +29,26 @@ class ElevenLabsVoiceService:
         Returns audio bytes (MP3)
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/text-to-speech/{voice_id}",
-                    headers={
-                        "Accept": "audio/mpeg",
-                        "Content-Type": "application/json",
-                        "xi-api-key": self.api_key
-                    },
-                    json={
-                        "text": text,
-                        "model_id": model_id,
-                        "voice_settings": {
-                            "stability": stability,
-                            "similarity_boost": similarity_boost
-                        }
-                    },
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                return response.content
+            client = self.client
+            response = await client.post(
+                f"{self.base_url}/text-to-speech/{voice_id}",
+                headers={
+                    "Accept": "audio/mpeg",
+                    "Content-Type": "application/json",
+                    "xi-api-key": self.api_key
+                },
+                json={
+                    "text": text,
+                    "model_id": model_id,
+                    "voice_settings": {
+                        "stability": stability,
+                        "similarity_boost": similarity_boost
+                    }
+                },
+                timeout=30.0
+            )
+            response.raise_for_status()
+            return response.content
                 
         except Exception as e:
             raise Exception(f"ElevenLabs voiceover generation failed: {str(e)}")
@@ -49,14 +56,14 @@ class ElevenLabsVoiceService:
     async def get_voices(self) -> list:
         """Get available voices"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/voices",
-                    headers={"xi-api-key": self.api_key},
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                return response.json().get("voices", [])
+            client = self.client
+            response = await client.get(
+                f"{self.base_url}/voices",
+                headers={"xi-api-key": self.api_key},
+                timeout=10.0
+            )
+            response.raise_for_status()
+            return response.json().get("voices", [])
         except Exception as e:
             print(f"Failed to get voices: {str(e)}")
             return []
@@ -1,24 +1,47 @@
 import httpx
 from app.core.config import settings
+from app.core.http_clients import get_http_client
+from app.core.result_cache import ResultCache
 from typing import List, Dict, Optional
 import base64
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Part of every cache key: bump when the request payloads below change, so results
+# of the old requests aren't served for the new ones
+ENHANCEMENT_CACHE_VERSION = 1
+
+# Results by (image content hash, operation, options), shared by every job in the process
+enhancement_cache = ResultCache("enhance", ttl=settings.ENHANCEMENT_CACHE_TTL)
+
 
 class ImageEnhancementService:
-    def __init__(self):
+    """
+    Nano Banana image enhancement. Calls given the image's content hash (image_hash,
+    see StorageService.store_file) are cached in enhancement_cache, so the same image
+    with the same options is only sent to the API once.
+    """
+    
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, cache: Optional[ResultCache] = None):
         self.api_key = settings.NANOBANANA_API_KEY
         self.base_url = "https://api.nanobanana.ai/v1"  # Nano Banana API base URL
+        self._client = client
+        self.cache = cache or enhancement_cache
         
         # Check if API key is set
         if not self.api_key or self.api_key.strip() == "":
             logger.warning("NANOBANANA_API_KEY is not set. Image enhancement will use fallback (return original images).")
     
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client for the provider API (or the injected one)"""
+        return get_http_client(self.base_url, self._client)
+    
     async def enhance_image_clarity(
         self,
-        image_url: str
+        image_url: str,
+        image_hash: Optional[str] = None
     ) -> str:
         """
         Enhance image clarity and quality using Nano Banana AI
@@ -31,31 +54,38 @@ class ImageEnhancementService:
             logger.warning("NANOBANANA_API_KEY not set, skipping enhancement, using original image")
             return image_url
         
+        cache_key = self._cache_key("clarity", image_hash)
+        cached = await self._cached(cache_key)
+        if cached:
+            logger.info(f"Using cached clarity enhancement: {cached}")
+            return cached
+        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/enhance",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "image_url": image_url,
-                        "enhancement_type": "clarity",
-                        "options": {
-                            "quality_boost": True,
-                            "sharpness": True,
-                            "noise_reduction": True,
-                            "color_correction": True
-                        }
-                    },
-                    timeout=60.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                enhanced_url = result.get("enhanced_image_url") or result.get("output_url")
-                logger.info(f"Successfully enhanced image clarity: {enhanced_url}")
-                return enhanced_url
+            client = self.client
+            response = await client.post(
+                f"{self.base_url}/enhance",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "image_url": image_url,
+                    "enhancement_type": "clarity",
+                    "options": {
+                        "quality_boost": True,
+                        "sharpness": True,
+                        "noise_reduction": True,
+                        "color_correction": True
+                    }
+                },
+                timeout=60.0
+            )
+            response.raise_for_status()
+            result = response.json()
+            enhanced_url = result.get("enhanced_image_url") or result.get("output_url")
+            logger.info(f"Successfully enhanced image clarity: {enhanced_url}")
+            await self._remember(cache_key, enhanced_url)
+            return enhanced_url
         except Exception as e:
             error_msg = str(e)
             logger.error(f"Image clarity enhancement failed: {error_msg}", exc_info=True)
@@ -65,10 +95,18 @@ class ImageEnhancementService:
             # Fallback: return original image if enhancement fails
             return image_url
     
+    def clarity_hash(self, image_hash: Optional[str]) -> Optional[str]:
+        """
+        Stand-in content hash of enhance_image_clarity's output for an image, to key the
+        cache of operations on the enhanced image (None without the image's hash)
+        """
+        return self._result_hash("clarity", image_hash)
+    
     async def generate_multiple_angles(
         self,
         image_url: str,
-        num_angles: int = 6
+        num_angles: int = 6,
+        image_hash: Optional[str] = None
     ) -> List[str]:
         """
         Generate multiple angles or style variations of the product image
@@ -81,36 +119,44 @@ class ImageEnhancementService:
             logger.warning("NANOBANANA_API_KEY not set, skipping style variations, using original image")
             return [image_url]
         
+        # Variations only: the first entry is the caller's own image URL
+        cache_key = self._cache_key("multi_angle", image_hash, num_angles)
+        cached = await self._cached(cache_key)
+        if cached:
+            logger.info(f"Using {len(cached)} cached style variations")
+            return [image_url] + cached
+        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/multi-angle",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "image_url": image_url,
-                        "num_variations": num_angles,
-                        "styles": ["realistic", "studio", "natural", "professional", "dramatic", "bright"],
-                        "angles": ["front", "side", "back", "top", "diagonal", "closeup"],
-                        "options": {
-                            "maintain_quality": True,
-                            "consistent_lighting": False,  # Allow different lighting for variety
-                            "vary_style": True,
-                            "generate_styles": True
-                        }
-                    },
-                    timeout=120.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                variation_urls = result.get("variation_urls") or result.get("angle_urls") or result.get("variations", [])
-                
-                # Include original enhanced image + all variations
-                all_variations = [image_url] + variation_urls[:num_angles-1]
-                logger.info(f"Successfully generated {len(all_variations)} style variations")
-                return all_variations
+            client = self.client
+            response = await client.post(
+                f"{self.base_url}/multi-angle",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "image_url": image_url,
+                    "num_variations": num_angles,
+                    "styles": ["realistic", "studio", "natural", "professional", "dramatic", "bright"],
+                    "angles": ["front", "side", "back", "top", "diagonal", "closeup"],
+                    "options": {
+                        "maintain_quality": True,
+                        "consistent_lighting": False,  # Allow different lighting for variety
+                        "vary_style": True,
+                        "generate_styles": True
+                    }
+                },
+                timeout=120.0
+            )
+            response.raise_for_status()
+            result = response.json()
+            variation_urls = result.get("variation_urls") or result.get("angle_urls") or result.get("variations", [])
+            
+            # Include original enhanced image + all variations
+            all_variations = [image_url] + variation_urls[:num_angles-1]
+            logger.info(f"Successfully generated {len(all_variations)} style variations")
+            await self._remember(cache_key, all_variations[1:])
+            return all_variations
         except Exception as e:
             logger.error(f"Style variation generation failed: {str(e)}", exc_info=True)
             # Fallback: return original image
@@ -120,7 +166,8 @@ class ImageEnhancementService:
         self,
         image_url: str,
         selling_points: List[str],
-        overlay_style: str = "modern"
+        overlay_style: str = "modern",
+        image_hash: Optional[str] = None
     ) -> str:
         """
         Overlay product selling points as text annotations on the image
@@ -133,45 +180,52 @@ class ImageEnhancementService:
             logger.warning("NANOBANANA_API_KEY not set, skipping overlay, using original image")
             return image_url
         
+        cache_key = self._cache_key("annotate", image_hash, list(selling_points), overlay_style)
+        cached = await self._cached(cache_key)
+        if cached:
+            logger.info(f"Using cached selling points overlay: {cached}")
+            return cached
+        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/annotate",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "image_url": image_url,
-                        "annotations": [
-                            {
-                                "text": point,
-                                "position": self._calculate_text_position(i, len(selling_points)),
-                                "style": {
-                                    "font_size": 32,
-                                    "font_weight": "bold",
-                                    "color": "#FFFFFF",
-                                    "background": "rgba(0,0,0,0.7)",
-                                    "padding": 10,
-                                    "border_radius": 8,
-                                    "animation": overlay_style
-                                }
+            client = self.client
+            response = await client.post(
+                f"{self.base_url}/annotate",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "image_url": image_url,
+                    "annotations": [
+                        {
+                            "text": point,
+                            "position": self._calculate_text_position(i, len(selling_points)),
+                            "style": {
+                                "font_size": 32,
+                                "font_weight": "bold",
+                                "color": "#FFFFFF",
+                                "background": "rgba(0,0,0,0.7)",
+                                "padding": 10,
+                                "border_radius": 8,
+                                "animation": overlay_style
                             }
-                            for i, point in enumerate(selling_points)
-                        ],
-                        "options": {
-                            "smart_placement": True,  # AI determines best text placement
-                            "avoid_important_areas": True,
-                            "readability": True
                         }
-                    },
-                    timeout=60.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                annotated_url = result.get("annotated_image_url") or result.get("output_url")
-                logger.info(f"Successfully overlaid selling points: {annotated_url}")
-                return annotated_url
+                        for i, point in enumerate(selling_points)
+                    ],
+                    "options": {
+                        "smart_placement": True,  # AI determines best text placement
+                        "avoid_important_areas": True,
+                        "readability": True
+                    }
+                },
+                timeout=60.0
+            )
+            response.raise_for_status()
+            result = response.json()
+            annotated_url = result.get("annotated_image_url") or result.get("output_url")
+            logger.info(f"Successfully overlaid selling points: {annotated_url}")
+            await self._remember(cache_key, annotated_url)
+            return annotated_url
         except Exception as e:
             logger.error(f"Selling points overlay failed: {str(e)}", exc_info=True)
             # Fallback: return original image if overlay fails
@@ -187,14 +241,40 @@ class ImageEnhancementService:
         ]
         return positions[index % len(positions)]
     
+    def _cache_key(self, operation: str, image_hash: Optional[str], *options) -> Optional[str]:
+        """Cache key of an operation on an image, None (not cached) without the image's content hash"""
+        if not image_hash:
+            return None
+        return self.cache.key(ENHANCEMENT_CACHE_VERSION, operation, image_hash, *options)
+    
+    def _result_hash(self, operation: str, image_hash: Optional[str], *options) -> Optional[str]:
+        """
+        Stand-in content hash of an operation's output image, for caching the operations
+        chained after it: the same input and options always map to the same cached output
+        """
+        cache_key = self._cache_key(operation, image_hash, *options)
+        return cache_key.split(":", 1)[1] if cache_key else None
+    
+    async def _cached(self, cache_key: Optional[str]):
+        if not cache_key:
+            return None
+        return await self.cache.get(cache_key)
+    
+    async def _remember(self, cache_key: Optional[str], result) -> None:
+        # Only real API results: the fallbacks (original image) are never cached
+        if cache_key and result:
+            await self.cache.set(cache_key, result)
+        
     async def enhance_image_comprehensive(
         self,
         image_url: str,
         selling_points: Optional[List[str]] = None,
-        generate_angles: bool = True
+        generate_angles: bool = True,
+        image_hash: Optional[str] = None
     ) -> Dict[str, any]:
         """
         Comprehensive image enhancement: clarity, multiple angles, and selling points overlay
+        (each step cached when image_hash is given)
         Returns dict with:
         - enhanced_url: clarity-enhanced image
         - angles: list of angle/variation URLs
@@ -209,11 +289,18 @@ class ImageEnhancementService:
         
         try:
             # Step 1: Enhance clarity and quality
-            result["enhanced_url"] = await self.enhance_image_clarity(image_url)
+            result["enhanced_url"] = await self.enhance_image_clarity(image_url, image_hash=image_hash)
+            image_hashes = {image_url: image_hash}
+            if result["enhanced_url"] != image_url:
+                image_hashes[result["enhanced_url"]] = self.clarity_hash(image_hash)
             
             # Step 2: Generate multiple style variations
             if generate_angles:
-                result["angles"] = await self.generate_multiple_angles(result["enhanced_url"], num_angles=6)
+                result["angles"] = await self.generate_multiple_angles(
+                    result["enhanced_url"],
+                    num_angles=6,
+                    image_hash=image_hashes[result["enhanced_url"]]
+                )
                 logger.info(f"Generated {len(result['angles'])} style variations")
             else:
                 result["angles"] = [result["enhanced_url"]]
@@ -224,7 +311,8 @@ class ImageEnhancementService:
                 best_image = result["enhanced_url"] or result["angles"][0] if result["angles"] else image_url
                 result["annotated_url"] = await self.overlay_selling_points(
                     best_image,
-                    selling_points
+                    selling_points,
+                    image_hash=image_hashes.get(best_image)
                 )
             
             logger.info(f"Comprehensive enhancement completed successfully")
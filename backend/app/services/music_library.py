@@ -0,0 +1,233 @@
+import ffmpeg
+import numpy as np
+import asyncio
+import json
+import os
+import logging
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.beat_tracker import ANALYSIS_SAMPLE_RATE, beat_tracker
+from app.services.render_scheduler import render_scheduler
+from app.services.video_processor import MEZZANINE_CHANNELS, MEZZANINE_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# One fixed-size record per track, sorted by (style, duration) so each style is a
+# contiguous run that can be binary-searched by duration straight from the mapped file
+TRACK_RECORD = np.dtype([
+    ("style", "<u2"),
+    ("duration", "<f4"),  # seconds
+    ("bpm", "<f4"),  # 0 when no pulse was found
+    ("loudness", "<f4"),  # RMS level of the non-silent audio, dBFS
+    ("beats_start", "<u4"),  # first beat in beats.f32
+    ("beats_count", "<u4"),
+])
+
+INDEX_VERSION = 1
+CATALOG_FILE = "catalog.json"  # styles, record ranges and track files (small, read whole)
+TRACKS_FILE = "tracks.idx"  # TRACK_RECORD array
+BEATS_FILE = "beats.f32"  # every track's beat times (seconds), back to back
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".aac", ".flac", ".ogg")
+
+
+class MusicLibrary:
+    """
+    Read side of the precomputed music catalog index (see build_music_index).
+    The track records and beat grids are memory-mapped, so every worker process
+    shares the page cache instead of loading the catalog, and select() is a binary
+    search over one style's records.
+    """
+    
+    def __init__(self, index_dir: str = ""):
+        self.index_dir = index_dir or settings.MUSIC_INDEX_DIR
+        self._catalog: Optional[Dict] = None
+        self._tracks = None
+        self._beats = None
+        self._track_ids: Dict[str, int] = {}
+    
+    def available(self) -> bool:
+        """Whether an index has been built into index_dir"""
+        return bool(self.index_dir) and os.path.exists(os.path.join(self.index_dir, CATALOG_FILE))
+    
+    def load(self) -> None:
+        """Map the index files (once per process)"""
+        if self._catalog is not None:
+            return
+        with open(os.path.join(self.index_dir, CATALOG_FILE), encoding="utf-8") as f:
+            catalog = json.load(f)
+        if catalog.get("version") != INDEX_VERSION:
+            raise Exception(f"Unsupported music index version {catalog.get('version')} in {self.index_dir}")
+        
+        self._tracks = np.memmap(os.path.join(self.index_dir, TRACKS_FILE), dtype=TRACK_RECORD, mode="r")
+        beats_path = os.path.join(self.index_dir, BEATS_FILE)
+        # np.memmap can't map an empty file (a catalog without beats)
+        self._beats = np.memmap(beats_path, dtype="<f4", mode="r") if os.path.getsize(beats_path) else np.zeros(0, "<f4")
+        self._track_ids = {self._track_url(path): i for i, path in enumerate(catalog["tracks"])}
+        self._catalog = catalog
+        logger.info(f"Loaded music index: {len(self._tracks)} tracks, {len(catalog['styles'])} styles")
+    
+    def select(self, style: str, duration: float) -> Optional[Dict]:
+        """
+        Best-fitting track for a style and target duration: the shortest track at least
+        duration seconds long (so it never has to loop), else the longest one.
+        None if the catalog has no tracks for the style.
+        """
+        self.load()
+        if style not in self._catalog["styles"]:
+            return None
+        start, end = self._catalog["styles"][style]
+        if start == end:
+            return None
+        
+        # Durations are sorted within a style's run: O(log n) without reading other records
+        i = start + int(np.searchsorted(self._tracks["duration"][start:end], duration, side="left"))
+        return self._track(min(i, end - 1), style)
+    
+    def beat_grid(self, track_url: str) -> Optional[List[float]]:
+        """Beat times (seconds) of a catalog track, None if it isn't in the catalog"""
+        self.load()
+        i = self._track_ids.get(track_url)
+        if i is None:
+            return None
+        record = self._tracks[i]
+        start = int(record["beats_start"])
+        return self._beats[start:start + int(record["beats_count"])].astype(float).round(3).tolist()
+    
+    def _track(self, i: int, style: str) -> Dict:
+        record = self._tracks[i]
+        return {
+            "url": self._track_url(self._catalog["tracks"][i]),
+            "style": style,
+            "duration": round(float(record["duration"]), 3),
+            "bpm": round(float(record["bpm"]), 2),
+            "loudness": round(float(record["loudness"]), 2),
+        }
+    
+    def _track_url(self, path: str) -> str:
+        """Catalog paths are relative to the index dir"""
+        return os.path.join(os.path.abspath(self.index_dir), path)
+
+
+async def build_music_index(source_dir: str, index_dir: str) -> int:
+    """
+    Build the catalog index offline from a directory of tracks laid out as
+    <source_dir>/<style>/<track>. Every track is decoded once to record its duration,
+    loudness, tempo and beat grid (beat_tracker), and transcoded to an AAC copy at the
+    render sample rate and channel layout (index_dir/audio/<style>/), which renders
+    then mix as is. Returns the number of indexed tracks.
+    """
+    
+    sources = sorted(
+        (style, name)
+        for style in os.listdir(source_dir)
+        if os.path.isdir(os.path.join(source_dir, style))
+        for name in os.listdir(os.path.join(source_dir, style))
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    )
+    
+    async def analyze(style: str, name: str) -> Dict:
+        # Keeps the source extension: a.mp3 and a.wav in one style are two tracks
+        track_path = f"audio/{style}/{name}.m4a"
+        os.makedirs(os.path.join(index_dir, "audio", style), exist_ok=True)
+        samples = await _prepare_track(os.path.join(source_dir, style, name), os.path.join(index_dir, track_path))
+        grid = beat_tracker.track(samples)
+        return {
+            "style": style,
+            "path": track_path,
+            "duration": len(samples) / ANALYSIS_SAMPLE_RATE,
+            "bpm": grid["bpm"] or 0.0,
+            "loudness": _loudness(samples),
+            "beats": grid["beats"],
+        }
+    
+    # The scheduler spreads the decodes over the host's encode slots
+    tracks = await asyncio.gather(*(analyze(style, name) for style, name in sources))
+    tracks.sort(key=lambda t: (t["style"], t["duration"]))
+    
+    styles = sorted({t["style"] for t in tracks})
+    records = np.zeros(len(tracks), dtype=TRACK_RECORD)
+    beats = []
+    beats_start = 0
+    # Record range [start, end) of each style's run
+    ranges = {}
+    for i, track in enumerate(tracks):
+        records[i] = (
+            styles.index(track["style"]),
+            track["duration"],
+            track["bpm"],
+            track["loudness"],
+            beats_start,
+            len(track["beats"]),
+        )
+        beats.append(np.asarray(track["beats"], dtype="<f4"))
+        beats_start += len(track["beats"])
+        ranges.setdefault(track["style"], [i, i])[1] = i + 1
+    
+    os.makedirs(index_dir, exist_ok=True)
+    records.tofile(os.path.join(index_dir, TRACKS_FILE))
+    (np.concatenate(beats) if beats else np.zeros(0, "<f4")).tofile(os.path.join(index_dir, BEATS_FILE))
+    # Written last: an index only counts as built once its catalog exists
+    with open(os.path.join(index_dir, CATALOG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": INDEX_VERSION,
+            "sample_rate": MEZZANINE_SAMPLE_RATE,
+            "styles": ranges,
+            "tracks": [t["path"] for t in tracks],
+        }, f)
+    
+    logger.info(f"Built music index in {index_dir}: {len(tracks)} tracks, {len(styles)} styles")
+    return len(tracks)
+
+
+async def _prepare_track(source_path: str, output_path: str) -> np.ndarray:
+    """
+    Decode a track once into an AAC copy at the render format and mono float PCM for
+    analysis (both outputs from one ffmpeg process)
+    """
+    pcm_path = f"{output_path}.f32"
+    audio = ffmpeg.input(source_path).audio.asplit()
+    stream = ffmpeg.merge_outputs(
+        ffmpeg.output(
+            audio[0], output_path,
+            acodec="aac", audio_bitrate="192k", ar=MEZZANINE_SAMPLE_RATE, ac=MEZZANINE_CHANNELS
+        ),
+        ffmpeg.output(audio[1], pcm_path, format="f32le", acodec="pcm_f32le", ar=ANALYSIS_SAMPLE_RATE, ac=1)
+    )
+    await render_scheduler.run(stream)
+    try:
+        return np.fromfile(pcm_path, dtype="<f4")
+    finally:
+        os.remove(pcm_path)
+
+
+def _loudness(samples: np.ndarray) -> float:
+    """RMS level (dBFS) over the non-silent 100ms blocks"""
+    block = ANALYSIS_SAMPLE_RATE // 10
+    blocks = samples[:len(samples) // block * block].reshape(-1, block)
+    if not len(blocks):
+        return -100.0
+    power = np.mean(blocks ** 2, axis=1)
+    # Gate out silence (below -60 dBFS) so intros and tails don't drag the level down
+    voiced = power[power > 1e-6]
+    return float(10 * np.log10(np.mean(voiced))) if len(voiced) else -100.0
+
+
+
+# Shared by every MusicSelector in the process
+music_library = MusicLibrary()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Build the music catalog index from a directory of tracks")
+    parser.add_argument("source_dir", help="Directory of <style>/<track> audio files")
+    parser.add_argument("index_dir", nargs="?", default=settings.MUSIC_INDEX_DIR, help="Output directory (default MUSIC_INDEX_DIR)")
+    args = parser.parse_args()
+    if not args.index_dir:
+        parser.error("index_dir is required when MUSIC_INDEX_DIR is not set")
+    
+    logging.basicConfig(level=logging.INFO)
+    count = asyncio.run(build_music_index(args.source_dir, args.index_dir))
+    print(f"Indexed {count} tracks into {args.index_dir}")
@@ -1,10 +1,16 @@
 from typing import Dict, Optional
 import random
+import logging
+from app.services.music_library import music_library
+
+logger = logging.getLogger(__name__)
 
 
 class MusicSelector:
     """
     Music selection service
+    Picks from the precomputed catalog index (MUSIC_INDEX_DIR, see music_library) when
+    one is built, else from the example MUSIC_LIBRARY below
     In production, integrate with music library APIs (Epidemic Sound, Artlist, etc.)
     """
     
@@ -32,12 +38,26 @@ class MusicSelector:
     ) -> Dict:
         """
         Select appropriate background music
-        Returns music file path/URL
+        Returns music file path/URL; catalog tracks are the best fit for the duration
+        (track_duration), already transcoded to the render format
         """
         # Map product category to music style
         if product_category:
             style = self._map_category_to_style(product_category)
         
+        if music_library.available():
+            track = music_library.select(style, duration) or music_library.select("energetic", duration)
+            if track:
+                return {
+                    "url": track["url"],
+                    "bpm": track["bpm"],
+                    "style": track["style"],
+                    "duration": duration,
+                    "track_duration": track["duration"],
+                    "loudness": track["loudness"]
+                }
+            logger.warning(f"Music index has no {style} tracks, using the built-in library")
+                
         # Get music options for style
         options = self.MUSIC_LIBRARY.get(style, self.MUSIC_LIBRARY["energetic"])
         
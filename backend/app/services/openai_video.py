@@ -1,6 +1,7 @@
 import httpx
 from app.core.config import settings
-from typing import List
+from app.core.http_clients import get_http_client
+from typing import List, Optional
 import asyncio
 import base64
 import logging
@@ -11,9 +12,15 @@ logger = logging.getLogger(__name__)
 
 
 class OpenAIVideoService:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.api_key = settings.OPENAI_API_KEY
         self.base_url = "https://api.openai.com/v1"
+        self._client = client
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client for the provider API (or the injected one)"""
+        return get_http_client(self.base_url, self._client)
     
     async def generate_video(
         self,
@@ -34,41 +41,41 @@ class OpenAIVideoService:
         prompt_image = await self._prepare_image(image_url)
         
         try:
-            async with httpx.AsyncClient() as client:
-                # OpenAI Sora API endpoint
-                response = await client.post(
-                    f"{self.base_url}/video/generations",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": model,
-                        "image": prompt_image,
-                        "prompt": prompt,
-                        "aspect_ratio": aspect_ratio,
-                        **kwargs
-                    },
-                    timeout=60.0
-                )
-                
-                if response.status_code == 401:
-                    raise Exception("OpenAI API authentication failed. Please contact support.")
-                
-                response.raise_for_status()
-                result = response.json()
-                
-                # Check if video URL is in response
-                video_url = result.get("video_url") or result.get("url") or (result.get("data") and result["data"][0].get("url"))
-                if video_url:
-                    return video_url
-                
-                # Poll for completion if async
-                generation_id = result.get("id") or result.get("job_id")
-                if generation_id:
-                    return await self._poll_generation_status(generation_id, client)
-                
-                raise Exception(f"Unexpected response format: {result}")
+            client = self.client
+            # OpenAI Sora API endpoint
+            response = await client.post(
+                f"{self.base_url}/video/generations",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": model,
+                    "image": prompt_image,
+                    "prompt": prompt,
+                    "aspect_ratio": aspect_ratio,
+                    **kwargs
+                },
+                timeout=60.0
+            )
+            
+            if response.status_code == 401:
+                raise Exception("OpenAI API authentication failed. Please contact support.")
+            
+            response.raise_for_status()
+            result = response.json()
+            
+            # Check if video URL is in response
+            video_url = result.get("video_url") or result.get("url") or (result.get("data") and result["data"][0].get("url"))
+            if video_url:
+                return video_url
+            
+            # Poll for completion if async
+            generation_id = result.get("id") or result.get("job_id")
+            if generation_id:
+                return await self._poll_generation_status(generation_id, client)
+            
+            raise Exception(f"Unexpected response format: {result}")
                 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 401:
@@ -87,33 +94,33 @@ class OpenAIVideoService:
                 from app.core.config import settings
                 image_url = f"{settings.API_BASE_URL}{image_url}"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(image_url, timeout=10.0)
-                response.raise_for_status()
-                image_data = response.content
-                
-                # Compress image
-                img = Image.open(BytesIO(image_data))
-                max_width, max_height = 1920, 1080
-                if img.width > max_width or img.height > max_height:
-                    img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-                
-                # Convert to RGB if needed
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    rgb_img.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                    img = rgb_img
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                output = BytesIO()
-                img.save(output, format='JPEG', quality=85, optimize=True)
-                image_data = output.getvalue()
-                
-                base64_image = base64.b64encode(image_data).decode('utf-8')
-                return f"data:image/jpeg;base64,{base64_image}"
+            client = get_http_client(image_url, self._client)
+            response = await client.get(image_url, timeout=10.0)
+            response.raise_for_status()
+            image_data = response.content
+            
+            # Compress image
+            img = Image.open(BytesIO(image_data))
+            max_width, max_height = 1920, 1080
+            if img.width > max_width or img.height > max_height:
+                img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+            
+            # Convert to RGB if needed
+            if img.mode in ('RGBA', 'LA', 'P'):
+                rgb_img = Image.new('RGB', img.size, (255, 255, 255))
+                if img.mode == 'P':
+                    img = img.convert('RGBA')
+                rgb_img.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+                img = rgb_img
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+            
+            output = BytesIO()
+            img.save(output, format='JPEG', quality=85, optimize=True)
+            image_data = output.getvalue()
+            
+            base64_image = base64.b64encode(image_data).decode('utf-8')
+            return f"data:image/jpeg;base64,{base64_image}"
         except Exception as e:
             logger.error(f"Failed to prepare image: {str(e)}")
             raise Exception(f"Failed to load image: {str(e)}")
@@ -0,0 +1,410 @@
+import ffmpeg
+from typing import List, Optional, Tuple
+
+
+# Frames scored by the thumbnail filter when picking a representative frame
+THUMBNAIL_BATCH_FRAMES = 100
+
+
+class RenderPlan:
+    """
+    Builds a single ffmpeg filtergraph for one rendered output:
+    per-clip crop/scale/pad -> concat (or xfade transitions) -> subtitle burn-in (or a soft subtitle track), plus the voiceover/music mix,
+    encoded once instead of writing an intermediate MP4 after every step.
+    
+    Usage:
+        plan = RenderPlan(1080, 1920)
+        plan.add_clips(clip_paths)
+        plan.set_subtitles(srt_path, style)
+        plan.set_audio(voiceover_path, music_path)
+        ffmpeg.run(plan.build(output_path))
+    
+    Multi-output: the timeline is decoded once at the plan size and split into
+    one crop/scale/pad branch per add_output() call, all written by one process:
+        plan.add_output("9_16.mp4", 1080, 1920, crop_ratio=9 / 16)
+        plan.add_output("16_9.mp4", 1920, 1080)
+        ffmpeg.run(plan.build_outputs())
+    """
+    
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.clip_paths: List[str] = []
+        self.clip_durations: Optional[List[float]] = None
+        self.transitions: List[Optional[str]] = []
+        self.transition_duration = 0.0
+        self.crop_ratio: Optional[float] = None
+        self.subtitles: Optional[Tuple[str, str]] = None
+        self.subtitle_offset = 0.0
+        self.soft_subtitles = False
+        self.frame_rate: Optional[int] = None
+        self.voiceover_path: Optional[str] = None
+        self.music_path: Optional[str] = None
+        self.music_volume = 0.3
+        self.audio_duration: Optional[float] = None
+        self.premixed_audio_path: Optional[str] = None
+        self.thumbnail: Optional[Tuple[str, bool]] = None
+        self.outputs: List[Tuple[str, int, int, Optional[float]]] = []
+        self.output_options = {"vcodec": "libx264", "pix_fmt": "yuv420p", "acodec": "aac"}
+    
+    def add_clips(self, clip_paths: List[str], crop_ratio: Optional[float] = None) -> "RenderPlan":
+        """
+        Add timeline clips in order
+        crop_ratio: center-crop each clip to this width / height before scaling
+        (derives an aspect ratio from a master clip)
+        """
+        self.clip_paths.extend(clip_paths)
+        self.crop_ratio = crop_ratio
+        return self
+    
+    def set_clip_durations(self, durations: List[float]) -> "RenderPlan":
+        """
+        Play each clip for exactly this many seconds: trimmed, or held on its last frame
+        when it is shorter (cuts snapped to the music's beats, see snap_cuts_to_beats)
+        """
+        self.clip_durations = list(durations)
+        return self
+    
+    def set_transitions(self, transitions: List[Optional[str]], duration: float) -> "RenderPlan":
+        """
+        Transition between clips: transitions[i] is the xfade transition from clip i into
+        clip i + 1 (None = hard cut), overlapping the two by duration seconds. Needs clip
+        durations (set_clip_durations) to place them and a frame rate (set_frame_rate):
+        xfade only takes constant frame rate inputs
+        """
+        self.transitions = list(transitions)
+        self.transition_duration = duration
+        return self
+    
+    def transition_overlaps(self, durations: List[float]) -> List[float]:
+        """Seconds each cut's transition overlaps its clips (0 for a hard cut), at most half of either clip"""
+        return [
+            min(self.transition_duration, durations[i] / 2, durations[i + 1] / 2)
+            if i < len(self.transitions) and self.transitions[i] else 0.0
+            for i in range(len(durations) - 1)
+        ]
+    
+    def set_subtitles(
+        self,
+        srt_path: str,
+        force_style: str,
+        offset: float = 0.0,
+        soft: bool = False
+    ) -> "RenderPlan":
+        """
+        Burn in an SRT file with a libass force_style
+        offset: timeline position (seconds) of the plan's first frame, when it renders one segment
+        soft: mux the SRT as a mov_text subtitle track instead (no libass pass, the player
+        draws the captions; force_style doesn't apply)
+        """
+        self.subtitles = (srt_path, force_style)
+        self.subtitle_offset = offset
+        self.soft_subtitles = soft
+        return self
+    
+    def set_audio(
+        self,
+        voiceover_path: str,
+        music_path: Optional[str] = None,
+        music_volume: float = 0.3,
+        duration: Optional[float] = None
+    ) -> "RenderPlan":
+        """
+        Use the voiceover (optionally mixed with background music) as the output audio
+        duration: timeline length; the mix is padded with silence to it, so a short
+        voiceover doesn't cut the picture (outputs stop at the shortest stream)
+        """
+        self.voiceover_path = voiceover_path
+        self.music_path = music_path
+        self.music_volume = music_volume
+        self.audio_duration = duration
+        return self
+    
+    def set_premixed_audio(self, audio_path: str, duration: Optional[float] = None) -> "RenderPlan":
+        """
+        Mux an already mixed and encoded audio track (VideoProcessor.premix_audio) with stream copy
+        duration: timeline length; outputs are cut to it rather than to the shortest stream,
+        so a bed shorter than the picture ends the audio early but never the video
+        """
+        self.premixed_audio_path = audio_path
+        self.audio_duration = duration
+        return self
+    
+    def set_thumbnail(self, thumbnail_path: str, representative: bool = False) -> "RenderPlan":
+        """Also write a JPEG thumbnail of the rendered video (the first output) from the same pass"""
+        self.thumbnail = (thumbnail_path, representative)
+        return self
+    
+    def add_output(
+        self,
+        output_path: str,
+        width: int,
+        height: int,
+        crop_ratio: Optional[float] = None
+    ) -> "RenderPlan":
+        """
+        Add an output for build_outputs()
+        crop_ratio: center-crop the shared timeline to this width / height before scaling
+        """
+        self.outputs.append((output_path, width, height, crop_ratio))
+        return self
+    
+    def set_frame_rate(self, frame_rate: int) -> "RenderPlan":
+        """Resample the timeline to a constant frame rate"""
+        self.frame_rate = frame_rate
+        return self
+    
+    def set_output_options(self, **options) -> "RenderPlan":
+        """Override ffmpeg output options (codec, preset, crf, ...)"""
+        self.output_options.update(options)
+        return self
+    
+    def build_video(self):
+        """Build the video branch of the graph: one stream at the output size"""
+        video = self._burn_subtitles(self._build_timeline(self.crop_ratio))
+        if self.frame_rate:
+            # Last, so the output frame rate (and timebase) is fixed whatever came before
+            video = video.filter("fps", fps=self.frame_rate)
+        return video
+    
+    def build_audio(self):
+        """Build the audio branch of the graph, or None for a silent render"""
+        if self.premixed_audio_path:
+            return ffmpeg.input(self.premixed_audio_path).audio
+        if not self.voiceover_path:
+            return None
+        
+        audio = ffmpeg.input(self.voiceover_path).audio
+        if self.music_path:
+            # Only the music is turned down, then mixed under the voiceover at full level
+            music = ffmpeg.input(self.music_path).audio.filter("volume", volume=self.music_volume)
+            audio = ffmpeg.filter([audio, music], "amix", inputs=2, duration="longest", normalize=0)
+        if self.audio_duration:
+            # Bounded: an endless apad keeps -shortest from ever ending a filtergraph output
+            audio = audio.filter("apad", whole_dur=self.audio_duration)
+        return audio
+    
+    def build(self, output_path: str):
+        """Compile the plan into an ffmpeg output node ready for ffmpeg.run"""
+        video = self.build_video()
+        audio = self.build_audio()
+        
+        return self._with_thumbnail([video], audio, [output_path])
+    
+    def build_outputs(self):
+        """
+        Compile a multi-output plan: decode and concat the clips once, then fan the
+        timeline out with split into one branch per output. Subtitles are burned per
+        branch (they are laid out for the output size) from the same SRT, or muxed into
+        every output as a soft track; the audio
+        mix is built once and shared with asplit.
+        """
+        if not self.outputs:
+            raise ValueError("No outputs added")
+        
+        timeline = self._build_timeline()
+        if self.frame_rate:
+            # Once, before the split: every output shares the frame rate
+            timeline = timeline.filter("fps", fps=self.frame_rate)
+        audio = self.build_audio()
+        
+        count = len(self.outputs)
+        branches = [timeline] if count == 1 else [timeline.split()[i] for i in range(count)]
+        videos = [
+            self._burn_subtitles(self._fit(branch, width, height, crop_ratio))
+            for branch, (_, width, height, crop_ratio) in zip(branches, self.outputs)
+        ]
+        audios = None
+        # A premixed track is stream-copied into every output as is
+        if audio is not None and count > 1 and not self.premixed_audio_path:
+            split_audio = audio.asplit()
+            audios = [split_audio[i] for i in range(count)]
+        
+        return self._with_thumbnail(videos, audio, [path for path, _, _, _ in self.outputs], audios)
+    
+    def segment(self, index: int, offset: float, frame_rate: int) -> "RenderPlan":
+        """
+        Plan that encodes clip `index` on its own, as one segment of a segment-parallel
+        render: video only, at a constant frame rate and with identical encoder settings so
+        the segments join with stream copy, and with the subtitles shifted to the clip's
+        position (offset seconds) on the timeline
+        """
+        plan = RenderPlan(self.width, self.height)
+        plan.add_clips([self.clip_paths[index]], self.crop_ratio)
+        if self.clip_durations:
+            plan.set_clip_durations([self.clip_durations[index]])
+        plan.set_frame_rate(frame_rate)
+        plan.set_output_options(**self.output_options)
+        if self.subtitles and not self.soft_subtitles:
+            # Soft subtitles are muxed once for the whole timeline by build_mux
+            plan.set_subtitles(*self.subtitles, offset=offset)
+        if self.thumbnail and index == 0:
+            plan.set_thumbnail(*self.thumbnail)
+        return plan
+    
+    def filters_picture(self) -> bool:
+        """Whether the picture needs filtering besides conforming to the plan size and frame rate"""
+        return bool(
+            self.crop_ratio
+            or self.clip_durations
+            or any(self.transitions)
+            or (self.subtitles and not self.soft_subtitles)
+        )
+    
+    def build_copy(self, concat_file: str, output_path: str):
+        """
+        Compile a plan whose clips (a concat demuxer list) are already in the output
+        format and need no filtering (see filters_picture): the clips are joined with
+        stream copy and muxed with the audio like build_mux, and only the thumbnail
+        decodes any frames
+        """
+        stream = self.build_mux(concat_file, output_path)
+        if not self.thumbnail:
+            return stream
+        video = ffmpeg.input(concat_file, format="concat", safe=0).video
+        return ffmpeg.merge_outputs(stream, self._thumbnail_output(video))
+    
+    def build_mux(self, concat_file: str, output_path: str):
+        """
+        Join encoded segments (a concat demuxer list) with stream copy and add the
+        plan's audio mix, encoded once for the whole timeline (and the soft subtitle track)
+        """
+        streams = [ffmpeg.input(concat_file, format="concat", safe=0).video]
+        options = {"vcodec": "copy", "movflags": "+faststart"}
+        audio = self.build_audio()
+        if audio is not None:
+            streams.append(audio)
+            options.update({
+                key: value for key, value in self.output_options.items()
+                if key in ("acodec", "audio_bitrate")
+            })
+            # Stop at the end of the picture rather than the longest audio input
+            options["shortest"] = None
+            self._copy_premixed_audio(options)
+        self._add_soft_subtitles(streams, options)
+        return ffmpeg.output(*streams, output_path, **options)
+    
+    def _with_thumbnail(self, videos: list, audio, output_paths: List[str], audios: Optional[list] = None):
+        """Write one output per video stream, plus the thumbnail from the first one"""
+        videos = list(videos)
+        thumbnail_video = None
+        if self.thumbnail:
+            split = videos[0].split()
+            videos[0], thumbnail_video = split[0], split[1]
+        
+        outputs = [
+            self._output(video, audios[i] if audios else audio, output_path)
+            for i, (video, output_path) in enumerate(zip(videos, output_paths))
+        ]
+        
+        if thumbnail_video is not None:
+            outputs.append(self._thumbnail_output(thumbnail_video))
+        return outputs[0] if len(outputs) == 1 else ffmpeg.merge_outputs(*outputs)
+    
+    def _thumbnail_output(self, video):
+        thumbnail_path, representative = self.thumbnail
+        if representative:
+            # Scores each batch of frames against the batch average and keeps the closest one
+            video = video.filter("thumbnail", THUMBNAIL_BATCH_FRAMES)
+        return ffmpeg.output(video, thumbnail_path, vframes=1)
+    
+    def _output(self, video, audio, output_path: str):
+        streams = [video] + ([audio] if audio is not None else [])
+        options = dict(self.output_options)
+        if audio is not None:
+            # Stop at the end of the picture rather than the longest audio input
+            options["shortest"] = None
+            self._copy_premixed_audio(options)
+        else:
+            options.pop("acodec", None)
+        self._add_soft_subtitles(streams, options)
+        return ffmpeg.output(*streams, output_path, **options)
+    
+    def _add_soft_subtitles(self, streams: list, options: dict) -> None:
+        """Map the SRT as a mov_text track (MP4's text subtitle codec), when subtitles are soft"""
+        if self.subtitles and self.soft_subtitles:
+            streams.append(ffmpeg.input(self.subtitles[0]))
+            options["scodec"] = "mov_text"
+    
+    def _copy_premixed_audio(self, options: dict) -> None:
+        """Switch output options to stream-copy the premixed track, when there is one"""
+        if self.premixed_audio_path:
+            options["acodec"] = "copy"
+            options.pop("audio_bitrate", None)
+            # The bed's length comes from the storyboard, the picture's from the clips
+            options.pop("shortest", None)
+            if self.audio_duration:
+                options["t"] = round(self.audio_duration, 3)
+    
+    def _build_timeline(self, crop_ratio: Optional[float] = None):
+        """Conform every clip to the plan size (and its set duration) and concat them"""
+        if not self.clip_paths:
+            raise ValueError("No video clips provided")
+        
+        videos = [
+            self._fit(ffmpeg.input(path).video, self.width, self.height, crop_ratio)
+            for path in self.clip_paths
+        ]
+        if self.clip_durations:
+            videos = [
+                video
+                # Clone the last frame for as long as a clip may be held, then cut to length
+                .filter("tpad", stop_mode="clone", stop_duration=duration)
+                .trim(duration=duration)
+                .setpts("PTS-STARTPTS")
+                for video, duration in zip(videos, self.clip_durations)
+            ]
+        if any(self.transitions) and len(videos) > 1:
+            return self._crossfade(videos)
+        return ffmpeg.concat(*videos, v=1, a=0) if len(videos) > 1 else videos[0]
+    
+    def _crossfade(self, videos: list):
+        """Chain the clips with xfade at each transition and concat at each hard cut"""
+        if not self.clip_durations or not self.frame_rate:
+            raise ValueError("Transitions need clip durations and a frame rate")
+        
+        # xfade needs constant frame rate inputs with matching timebases
+        videos = [video.filter("fps", fps=self.frame_rate) for video in videos]
+        overlaps = self.transition_overlaps(self.clip_durations)
+        timeline = videos[0]
+        end = self.clip_durations[0]  # output time the chain so far ends at
+        for i, overlap in enumerate(overlaps):
+            if overlap:
+                timeline = ffmpeg.filter(
+                    [timeline, videos[i + 1]], "xfade",
+                    transition=self.transitions[i], duration=round(overlap, 3), offset=round(end - overlap, 3)
+                )
+            else:
+                timeline = ffmpeg.concat(timeline, videos[i + 1], v=1, a=0)
+            end += self.clip_durations[i + 1] - overlap
+        return timeline
+    
+    def _burn_subtitles(self, video):
+        if not self.subtitles or self.soft_subtitles:
+            return video
+        srt_path, force_style = self.subtitles
+        if not self.subtitle_offset:
+            return video.filter("subtitles", srt_path, force_style=force_style)
+        # libass picks cues by frame timestamp: move the segment to its timeline position and back
+        return (
+            video
+            .setpts(f"PTS+{self.subtitle_offset}/TB")
+            .filter("subtitles", srt_path, force_style=force_style)
+            .setpts("PTS-STARTPTS")
+        )
+    
+    def _fit(self, video, width: int, height: int, crop_ratio: Optional[float] = None):
+        """Crop (optional), scale and pad a stream to width x height"""
+        if crop_ratio:
+            # Largest centered window with the target ratio, rounded down to even dimensions
+            video = video.filter(
+                "crop",
+                f"trunc(min(iw,ih*{crop_ratio})/2)*2",
+                f"trunc(min(ih,iw/{crop_ratio})/2)*2"
+            )
+        return (
+            video
+            .filter("scale", width, height, force_original_aspect_ratio="decrease")
+            .filter("pad", width, height, "(ow-iw)/2", "(oh-ih)/2")
+            .filter("setsar", 1)
+        )
@@ -0,0 +1,161 @@
+import ffmpeg
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: slots are only shared within the process
+
+logger = logging.getLogger(__name__)
+
+# How often a waiting encode re-checks for a free slot
+SLOT_POLL_INTERVAL = 0.25  # seconds
+
+
+class RenderScheduler:
+    """
+    Runs ffmpeg encodes as asyncio subprocesses, so the event loop keeps polling
+    providers and downloading while an encode runs, and caps how many encodes
+    share the host's cores.
+    
+    Slots are flock()ed files in a host-wide directory, so the cap holds across
+    every Celery worker process (and job) on the machine, not just this one.
+    Without fcntl (Windows development) the cap is an in-process semaphore.
+    Each encode gets cores / max_encodes threads, so a full set of concurrent
+    encodes uses every core without oversubscribing.
+    """
+    
+    def __init__(self, max_encodes: int = 0, slot_dir: str = ""):
+        cores = os.cpu_count() or 1
+        self.max_encodes = max_encodes or settings.RENDER_MAX_CONCURRENT_ENCODES or max(1, cores // 4)
+        self.threads = max(1, cores // self.max_encodes)
+        self.slot_dir = slot_dir or settings.RENDER_SLOT_DIR or os.path.join(tempfile.gettempdir(), "render-slots")
+        # Fallback slots when fcntl is unavailable, one semaphore per event loop
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for a free encode slot on this host"""
+        if fcntl is None:
+            loop = asyncio.get_running_loop()
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_encodes)
+            async with semaphore:
+                yield None
+            return
+        
+        os.makedirs(self.slot_dir, exist_ok=True)
+        while True:
+            for i in range(self.max_encodes):
+                fd = os.open(os.path.join(self.slot_dir, f"slot_{i}.lock"), os.O_CREAT | os.O_RDWR)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    continue
+                try:
+                    yield i
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+                return
+            await asyncio.sleep(SLOT_POLL_INTERVAL)
+    
+    async def run(self, stream, on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Run an ffmpeg-python output spec (overwriting outputs) in a subprocess once a slot
+        is free; raises ffmpeg.Error with the captured stderr if ffmpeg fails.
+        Encoders get their thread count from the output options (see VideoProcessor),
+        the filter graph gets the same budget here.
+        
+        ffmpeg reports -progress on stdout; on_progress gets every report
+        ({"frame", "fps", "out_time" (seconds), "speed"}). Returns the final report plus
+        the wall-clock "elapsed" seconds of the encode.
+        """
+        stream = stream.global_args(
+            "-hide_banner",
+            "-nostats",
+            "-progress", "pipe:1",
+            "-filter_threads", str(self.threads),
+            "-filter_complex_threads", str(self.threads)
+        )
+        args = ffmpeg.compile(stream, overwrite_output=True)
+        
+        async with self.slot():
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            started = time.monotonic()
+            try:
+                # Drain stderr alongside the progress reports so neither pipe fills up
+                stats, stderr = await asyncio.gather(
+                    self._read_progress(process.stdout, on_progress),
+                    process.stderr.read()
+                )
+                await process.wait()
+            except asyncio.CancelledError:
+                # Don't leave an orphaned encode holding the cores
+                process.kill()
+                await process.wait()
+                raise
+        
+        if process.returncode != 0:
+            logger.error(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace')[-2000:]}")
+            raise ffmpeg.Error("ffmpeg", b"", stderr)
+        
+        stats["elapsed"] = round(time.monotonic() - started, 2)
+        logger.info(
+            f"ffmpeg encode done: frames={stats.get('frame')} out_time={stats.get('out_time')}s "
+            f"elapsed={stats['elapsed']}s fps={stats.get('fps')} speed={stats.get('speed')}x"
+        )
+        return stats
+    
+    async def _read_progress(self, stdout, on_progress: Optional[Callable[[Dict], None]]) -> Dict:
+        """Parse -progress output: key=value lines, each report ends with progress=continue|end"""
+        report = {}
+        latest = {}
+        async for line in stdout:
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            if not key:
+                continue
+            report[key] = value
+            if key == "progress":
+                latest = self._parse_progress(report)
+                report = {}
+                if on_progress:
+                    try:
+                        on_progress(latest)
+                    except Exception as e:
+                        logger.warning(f"Progress callback failed: {str(e)}")
+        return latest
+    
+    def _parse_progress(self, report: Dict[str, str]) -> Dict:
+        def number(value: Optional[str], cast=float):
+            try:
+                return cast(value.rstrip("x"))
+            except (AttributeError, ValueError):
+                return None  # missing or "N/A"
+        
+        out_time_us = number(report.get("out_time_us"), int)
+        return {
+            "frame": number(report.get("frame"), int),
+            "fps": number(report.get("fps")),
+            "out_time": round(out_time_us / 1_000_000, 2) if out_time_us is not None else None,
+            "speed": number(report.get("speed")),
+        }
+
+
+# Shared by every VideoProcessor in the worker process
+render_scheduler = RenderScheduler()
@@ -1,5 +1,6 @@
 import httpx
 from app.core.config import settings
+from app.core.http_clients import get_http_client
 from typing import List, Dict, Optional
 import asyncio
 import base64
@@ -11,27 +12,33 @@ logger = logging.getLogger(__name__)
 
 
 class RunwayVideoService:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.api_key = settings.RUNWAY_API_KEY
         self.base_url = "https://api.dev.runwayml.com/v1"
         self.api_version = "2024-11-06"  # Updated API version
+        self._client = client
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client for the provider API (or the injected one)"""
+        return get_http_client(self.base_url, self._client)
     
     async def test_api_key(self) -> bool:
         """Test if API key is valid by making a simple API call"""
         if not self.api_key or not self.api_key.strip():
             return False
         try:
-            async with httpx.AsyncClient() as client:
-                # Try to list models or check account status
-                response = await client.get(
-                    f"{self.base_url}/models",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "X-Runway-Version": self.api_version
-                    },
-                    timeout=10.0
-                )
-                return response.status_code == 200
+            client = self.client
+            # Try to list models or check account status
+            response = await client.get(
+                f"{self.base_url}/models",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "X-Runway-Version": self.api_version
+                },
+                timeout=10.0
+            )
+            return response.status_code == 200
         except:
             return False
     
@@ -72,196 +79,196 @@ class RunwayVideoService:
             
             # Download image, compress/resize, and convert to base64
             logger.info(f"Downloading and compressing image for Runway: {image_url}")
-            async with httpx.AsyncClient() as download_client:
-                response = await download_client.get(image_url, timeout=10.0)
-                response.raise_for_status()
-                image_data = response.content
+            download_client = get_http_client(image_url, self._client)
+            response = await download_client.get(image_url, timeout=10.0)
+            response.raise_for_status()
+            image_data = response.content
+            
+            # ALWAYS compress and resize image to reduce size (Runway has size limits)
+            # This ensures ALL users can upload any image size
+            try:
+                img = Image.open(BytesIO(image_data))
+                original_size = len(image_data)
+                logger.info(f"Original image size: {original_size} bytes ({original_size / 1024 / 1024:.2f} MB), dimensions: {img.size}")
                 
-                # ALWAYS compress and resize image to reduce size (Runway has size limits)
-                # This ensures ALL users can upload any image size
-                try:
-                    img = Image.open(BytesIO(image_data))
-                    original_size = len(image_data)
-                    logger.info(f"Original image size: {original_size} bytes ({original_size / 1024 / 1024:.2f} MB), dimensions: {img.size}")
-                    
-                    # Resize if too large (max 1920x1080 for Runway)
-                    max_width, max_height = 1920, 1080
-                    if img.width > max_width or img.height > max_height:
-                        img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-                        logger.info(f"Resized image to: {img.size}")
-                    
-                    # Convert to JPEG with compression to reduce size (smaller than PNG)
+                # Resize if too large (max 1920x1080 for Runway)
+                max_width, max_height = 1920, 1080
+                if img.width > max_width or img.height > max_height:
+                    img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+                    logger.info(f"Resized image to: {img.size}")
+                
+                # Convert to JPEG with compression to reduce size (smaller than PNG)
+                output = BytesIO()
+                # Convert RGBA to RGB if needed (JPEG doesn't support transparency)
+                if img.mode in ('RGBA', 'LA', 'P'):
+                    # Create white background
+                    rgb_img = Image.new('RGB', img.size, (255, 255, 255))
+                    if img.mode == 'P':
+                        img = img.convert('RGBA')
+                    rgb_img.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+                    img = rgb_img
+                elif img.mode != 'RGB':
+                    img = img.convert('RGB')
+                
+                # Save as JPEG with quality 85 (good balance between quality and size)
+                img.save(output, format='JPEG', quality=85, optimize=True)
+                compressed_data = output.getvalue()
+                compressed_size = len(compressed_data)
+                reduction = ((original_size - compressed_size) / original_size * 100) if original_size > 0 else 0
+                logger.info(f"Compressed image size: {compressed_size} bytes ({compressed_size / 1024 / 1024:.2f} MB) - reduced by {reduction:.1f}%")
+                
+                # Check if still too large (Runway typically has ~10MB limit for base64)
+                # Base64 increases size by ~33%, so we want raw image < 7.5MB
+                max_raw_size = 7_500_000
+                if compressed_size > max_raw_size:
+                    # Further compress with lower quality
+                    logger.warning(f"Image still too large ({compressed_size} bytes), applying aggressive compression")
                     output = BytesIO()
-                    # Convert RGBA to RGB if needed (JPEG doesn't support transparency)
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        # Create white background
-                        rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                        if img.mode == 'P':
-                            img = img.convert('RGBA')
-                        rgb_img.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                        img = rgb_img
-                    elif img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    
-                    # Save as JPEG with quality 85 (good balance between quality and size)
-                    img.save(output, format='JPEG', quality=85, optimize=True)
-                    compressed_data = output.getvalue()
-                    compressed_size = len(compressed_data)
-                    reduction = ((original_size - compressed_size) / original_size * 100) if original_size > 0 else 0
-                    logger.info(f"Compressed image size: {compressed_size} bytes ({compressed_size / 1024 / 1024:.2f} MB) - reduced by {reduction:.1f}%")
-                    
-                    # Check if still too large (Runway typically has ~10MB limit for base64)
-                    # Base64 increases size by ~33%, so we want raw image < 7.5MB
-                    max_raw_size = 7_500_000
-                    if compressed_size > max_raw_size:
-                        # Further compress with lower quality
-                        logger.warning(f"Image still too large ({compressed_size} bytes), applying aggressive compression")
+                    quality = 70
+                    while compressed_size > max_raw_size and quality > 30:
                         output = BytesIO()
-                        quality = 70
-                        while compressed_size > max_raw_size and quality > 30:
-                            output = BytesIO()
-                            img.save(output, format='JPEG', quality=quality, optimize=True)
-                            compressed_data = output.getvalue()
-                            compressed_size = len(compressed_data)
-                            quality -= 10
-                            logger.info(f"Compressed with quality {quality}: {compressed_size} bytes ({compressed_size / 1024 / 1024:.2f} MB)")
-                        
-                        if compressed_size > max_raw_size:
-                            raise Exception(f"Image too large even after compression: {compressed_size} bytes. Please use a smaller image.")
+                        img.save(output, format='JPEG', quality=quality, optimize=True)
+                        compressed_data = output.getvalue()
+                        compressed_size = len(compressed_data)
+                        quality -= 10
+                        logger.info(f"Compressed with quality {quality}: {compressed_size} bytes ({compressed_size / 1024 / 1024:.2f} MB)")
                     
-                    image_data = compressed_data
-                    mime_type = 'image/jpeg'
-                except Exception as e:
-                    logger.warning(f"Failed to compress image, using original: {str(e)}")
-                    # Fallback to original if compression fails
-                    content_type = response.headers.get('content-type', '')
-                    if not content_type:
-                        if image_url.lower().endswith('.png'):
-                            mime_type = 'image/png'
-                        elif image_url.lower().endswith('.gif'):
-                            mime_type = 'image/gif'
-                        else:
-                            mime_type = 'image/jpeg'
-                    elif 'png' in content_type.lower():
+                    if compressed_size > max_raw_size:
+                        raise Exception(f"Image too large even after compression: {compressed_size} bytes. Please use a smaller image.")
+                
+                image_data = compressed_data
+                mime_type = 'image/jpeg'
+            except Exception as e:
+                logger.warning(f"Failed to compress image, using original: {str(e)}")
+                # Fallback to original if compression fails
+                content_type = response.headers.get('content-type', '')
+                if not content_type:
+                    if image_url.lower().endswith('.png'):
                         mime_type = 'image/png'
-                    elif 'gif' in content_type.lower():
+                    elif image_url.lower().endswith('.gif'):
                         mime_type = 'image/gif'
                     else:
                         mime_type = 'image/jpeg'
-                
-                base64_image = base64.b64encode(image_data).decode('utf-8')
-                base64_size = len(base64_image)
-                logger.info(f"Base64 size: {base64_size} chars ({base64_size / 1024 / 1024:.2f} MB)")
-                
-                # Create data URI
-                prompt_image = f"data:{mime_type};base64,{base64_image}"
-                logger.info(f"Successfully compressed and converted image to base64 (final size: {base64_size} chars)")
+                elif 'png' in content_type.lower():
+                    mime_type = 'image/png'
+                elif 'gif' in content_type.lower():
+                    mime_type = 'image/gif'
+                else:
+                    mime_type = 'image/jpeg'
+            
+            base64_image = base64.b64encode(image_data).decode('utf-8')
+            base64_size = len(base64_image)
+            logger.info(f"Base64 size: {base64_size} chars ({base64_size / 1024 / 1024:.2f} MB)")
+            
+            # Create data URI
+            prompt_image = f"data:{mime_type};base64,{base64_image}"
+            logger.info(f"Successfully compressed and converted image to base64 (final size: {base64_size} chars)")
         except Exception as e:
             logger.error(f"Failed to process image for Runway: {str(e)}", exc_info=True)
             raise Exception(f"Failed to load image for Runway video generation: {str(e)}")
         
         try:
-            async with httpx.AsyncClient() as client:
-                # Prepare request payload
-                payload = {
-                    "model": model,
-                    "promptImage": prompt_image,
-                    "promptText": prompt,
-                    "motionBucket": motion_bucket_id,
-                    "ratio": runway_ratio,
-                    "watermark": False
-                }
-                
-                # Log request details (without full base64 image)
-                base64_preview = prompt_image[:100] + "..." if len(prompt_image) > 100 else prompt_image
-                logger.info(f"Sending request to Runway API: {self.base_url}/image_to_video")
-                logger.info(f"Payload: model={model}, promptText={prompt[:50]}..., motionBucket={motion_bucket_id}, ratio={runway_ratio}")
-                logger.info(f"Image preview: {base64_preview}")
-                
-                # Create generation request
-                response = await client.post(
-                    f"{self.base_url}/image_to_video",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                        "X-Runway-Version": self.api_version
-                    },
-                    json=payload,
-                    timeout=60.0
-                )
-                
-                # Log response details for debugging
-                logger.info(f"Runway API response status: {response.status_code}")
-                
-                # Check for 400 Bad Request with detailed error
-                if response.status_code == 400:
-                    try:
-                        error_data = response.json()
-                        error_detail = error_data.get("error", {})
-                        error_message = error_detail.get("message", str(error_data)) if isinstance(error_detail, dict) else str(error_data)
-                        error_str = str(error_data) if isinstance(error_data, str) else str(error_data.get("error", error_data))
-                        
-                        logger.error(f"Runway API 400 Bad Request. Full response: {error_data}")
-                        
-                        # Check for specific error types
-                        if "credits" in error_str.lower() or "insufficient" in error_str.lower():
-                            raise Exception(f"Runway account has insufficient credits. Error: {error_str}. Please add credits to your Runway account at https://runwayml.com/account")
-                        
-                        raise Exception(f"Runway API validation error (400): {error_message}. This usually means invalid parameters. Check: model={model}, ratio={runway_ratio}, motionBucket={motion_bucket_id}. Full error: {error_data}")
-                    except Exception as e:
-                        if "credits" in str(e).lower() or "Runway API validation error" in str(e):
-                            raise
-                        logger.error(f"Failed to parse 400 error response: {str(e)}")
-                        error_text = response.text[:500]  # First 500 chars
-                        raise Exception(f"Runway API validation error (400 Bad Request). Response: {error_text}")
-                
-                # Check for 401 specifically before raise_for_status
-                if response.status_code == 401:
-                    error_detail = "401 Unauthorized"
-                    try:
-                        error_data = response.json()
-                        error_detail = error_data.get("error", {}).get("message", error_detail)
-                    except:
-                        pass
-                    raise Exception(f"RUNWAY_API_KEY is invalid, expired, or revoked. Error: {error_detail}. Please check your Runway API key at https://runwayml.com/api and update backend/.env file.")
-                
-                response.raise_for_status()
-                result = response.json()
-                
-                # Log the full response to understand structure
-                logger.info(f"Runway API response: {result}")
-                
-                # Check if the response already contains the video URL (synchronous response)
-                if "output" in result or "video_url" in result or "url" in result:
-                    output = result.get("output") or result.get("video_url") or result.get("url")
-                    if output:
-                        if isinstance(output, list) and len(output) > 0:
-                            logger.info(f"Video URL found in immediate response: {output[0]}")
-                            return output[0]
-                        elif isinstance(output, str):
-                            logger.info(f"Video URL found in immediate response: {output}")
-                            return output
-                
-                # Get generation ID - check multiple possible fields
-                generation_id = result.get("id") or result.get("generation_id") or result.get("task_id")
-                
-                if not generation_id:
-                    # If no ID, check if status is already in response
-                    status = result.get("status")
-                    if status == "succeeded":
-                        output = result.get("output", [""])
-                        if output and len(output) > 0:
-                            return output[0] if isinstance(output, list) else output
-                    elif status == "failed":
-                        raise Exception(f"Video generation failed: {result.get('error', 'Unknown error')}")
-                    else:
-                        raise Exception(f"Unexpected response format from Runway API. No generation ID and status is: {status}. Full response: {result}")
-                
-                logger.info(f"Generation ID extracted: {generation_id}")
-                
-                # Poll for completion
-                video_url = await self._poll_generation_status(generation_id, client)
-                return video_url
+            client = self.client
+            # Prepare request payload
+            payload = {
+                "model": model,
+                "promptImage": prompt_image,
+                "promptText": prompt,
+                "motionBucket": motion_bucket_id,
+                "ratio": runway_ratio,
+                "watermark": False
+            }
+            
+            # Log request details (without full base64 image)
+            base64_preview = prompt_image[:100] + "..." if len(prompt_image) > 100 else prompt_image
+            logger.info(f"Sending request to Runway API: {self.base_url}/image_to_video")
+            logger.info(f"Payload: model={model}, promptText={prompt[:50]}..., motionBucket={motion_bucket_id}, ratio={runway_ratio}")
+            logger.info(f"Image preview: {base64_preview}")
+            
+            # Create generation request
+            response = await client.post(
+                f"{self.base_url}/image_to_video",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                    "X-Runway-Version": self.api_version
+                },
+                json=payload,
+                timeout=60.0
+            )
+            
+            # Log response details for debugging
+            logger.info(f"Runway API response status: {response.status_code}")
+            
+            # Check for 400 Bad Request with detailed error
+            if response.status_code == 400:
+                try:
+                    error_data = response.json()
+                    error_detail = error_data.get("error", {})
+                    error_message = error_detail.get("message", str(error_data)) if isinstance(error_detail, dict) else str(error_data)
+                    error_str = str(error_data) if isinstance(error_data, str) else str(error_data.get("error", error_data))
+                    
+                    logger.error(f"Runway API 400 Bad Request. Full response: {error_data}")
+                    
+                    # Check for specific error types
+                    if "credits" in error_str.lower() or "insufficient" in error_str.lower():
+                        raise Exception(f"Runway account has insufficient credits. Error: {error_str}. Please add credits to your Runway account at https://runwayml.com/account")
+                    
+                    raise Exception(f"Runway API validation error (400): {error_message}. This usually means invalid parameters. Check: model={model}, ratio={runway_ratio}, motionBucket={motion_bucket_id}. Full error: {error_data}")
+                except Exception as e:
+                    if "credits" in str(e).lower() or "Runway API validation error" in str(e):
+                        raise
+                    logger.error(f"Failed to parse 400 error response: {str(e)}")
+                    error_text = response.text[:500]  # First 500 chars
+                    raise Exception(f"Runway API validation error (400 Bad Request). Response: {error_text}")
+            
+            # Check for 401 specifically before raise_for_status
+            if response.status_code == 401:
+                error_detail = "401 Unauthorized"
+                try:
+                    error_data = response.json()
+                    error_detail = error_data.get("error", {}).get("message", error_detail)
+                except:
+                    pass
+                raise Exception(f"RUNWAY_API_KEY is invalid, expired, or revoked. Error: {error_detail}. Please check your Runway API key at https://runwayml.com/api and update backend/.env file.")
+            
+            response.raise_for_status()
+            result = response.json()
+            
+            # Log the full response to understand structure
+            logger.info(f"Runway API response: {result}")
+            
+            # Check if the response already contains the video URL (synchronous response)
+            if "output" in result or "video_url" in result or "url" in result:
+                output = result.get("output") or result.get("video_url") or result.get("url")
+                if output:
+                    if isinstance(output, list) and len(output) > 0:
+                        logger.info(f"Video URL found in immediate response: {output[0]}")
+                        return output[0]
+                    elif isinstance(output, str):
+                        logger.info(f"Video URL found in immediate response: {output}")
+                        return output
+            
+            # Get generation ID - check multiple possible fields
+            generation_id = result.get("id") or result.get("generation_id") or result.get("task_id")
+            
+            if not generation_id:
+                # If no ID, check if status is already in response
+                status = result.get("status")
+                if status == "succeeded":
+                    output = result.get("output", [""])
+                    if output and len(output) > 0:
+                        return output[0] if isinstance(output, list) else output
+                elif status == "failed":
+                    raise Exception(f"Video generation failed: {result.get('error', 'Unknown error')}")
+                else:
+                    raise Exception(f"Unexpected response format from Runway API. No generation ID and status is: {status}. Full response: {result}")
+            
+            logger.info(f"Generation ID extracted: {generation_id}")
+            
+            # Poll for completion
+            video_url = await self._poll_generation_status(generation_id, client)
+            return video_url
                 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 401:
@@ -1,13 +1,32 @@
 import boto3
 from botocore.exceptions import ClientError
+from sqlalchemy.exc import IntegrityError
 from app.core.config import settings
-from typing import BinaryIO
-import uuid
+from app.db.database import SessionLocal
+from app.db.models import Artifact
+from typing import BinaryIO, Dict, Optional, Tuple
+import hashlib
+import logging
+import tempfile
 import os
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# Uploads are hashed in chunks of this size, and spooled to disk past the memory limit
+HASH_CHUNK_SIZE = 1024 * 1024  # bytes
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024  # bytes
+
 
 class StorageService:
+    """
+    Content-addressed file storage on S3, or local disk in development.
+    Files are stored under the SHA-256 of their bytes, so identical uploads (a shop
+    re-uploading the same product photo, a re-rendered video) share one object.
+    The artifacts table counts the uploads of each object; delete_file releases one
+    and the object is removed with the last.
+    """
+    
     def __init__(self):
         # Only initialize S3 client if credentials are provided
         self.has_s3_config = bool(settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY and settings.S3_BUCKET_NAME)
@@ -26,52 +45,69 @@ class StorageService:
     
     async def upload_file(self, file_obj: BinaryIO, key: str) -> str:
         """Upload file to S3 or local storage and return URL"""
+        return (await self.store_file(file_obj, key))["url"]
+    
+    async def store_file(self, file_obj: BinaryIO, key: str) -> Dict:
+        """
+        Store a file by content and return {"sha256", "url", "size", "deduplicated"}.
+        The hash is computed while the file is read, and content that is already stored
+        only gains a reference instead of being uploaded again. key only supplies the
+        file extension.
+        """
         try:
-            # Generate unique key if needed
-            if not key:
-                key = f"uploads/{uuid.uuid4()}"
+            ext = os.path.splitext(key or "")[1].lower()
+            if not self.has_s3_config:
+                ext = ext or '.jpg'
             
-            if self.has_s3_config:
-                # Upload to S3
-                self.s3_client.upload_fileobj(
-                    file_obj,
-                    self.bucket_name,
-                    key,
-                    ExtraArgs={'ACL': 'public-read'}
-                )
-                # Return public URL
-                url = f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{key}"
-                return url
-            else:
-                # Fallback to local storage for development
-                # Use unique filename to avoid conflicts
-                import uuid
-                original_file_name = os.path.basename(key) if '/' in key else key
-                file_ext = os.path.splitext(original_file_name)[1] or '.jpg'
-                unique_file_name = f"{uuid.uuid4()}{file_ext}"
-                file_path = os.path.join(self.local_storage_dir, unique_file_name)
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as spool:
+                sha256, size = self._spool(file_obj, spool)
                 
-                # Read file content and write to local storage
-                file_obj.seek(0)
-                content = file_obj.read()
-                with open(file_path, 'wb') as f:
-                    f.write(content)
-                
-                # Return local file path (served by the backend)
-                return f"{settings.API_BASE_URL}/local_storage/uploads/{unique_file_name}"
+                db = SessionLocal()
+                try:
+                    url = self._acquire(db, sha256)
+                    if url:
+                        logger.info(f"Upload {key} matches stored content {sha256[:12]}, skipping upload")
+                        return {"sha256": sha256, "url": url, "size": size, "deduplicated": True}
+                    
+                    spool.seek(0)
+                    url = self._put_object(spool, sha256, ext)
+                    return {"sha256": sha256, "url": self._register(db, sha256, url, size), "size": size, "deduplicated": False}
+                finally:
+                    db.close()
         except ClientError as e:
             raise Exception(f"Failed to upload file to S3: {str(e)}")
         except Exception as e:
             raise Exception(f"Failed to upload file: {str(e)}")
     
     async def delete_file(self, url: str):
-        """Delete file from S3"""
+        """
+        Release one upload of a file, deleting it from storage with the last reference.
+        Files stored before content addressing (no artifacts row) are deleted directly.
+        The decrement locks the artifact row until the object and the row are both gone,
+        so a concurrent store_file of the same content waits in _acquire and then uploads
+        it again, instead of taking a reference to an object that is being deleted.
+        """
+        db = SessionLocal()
         try:
-            # Extract key from URL
-            key = url.split(f"{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/")[-1]
-            self.s3_client.delete_object(Bucket=self.bucket_name, Key=key)
-        except ClientError as e:
-            print(f"Failed to delete file: {str(e)}")
+            updated = db.query(Artifact).filter(Artifact.url == url).update(
+                {Artifact.ref_count: Artifact.ref_count - 1}, synchronize_session=False
+            )
+            if updated:
+                ref_count = db.query(Artifact.ref_count).filter(Artifact.url == url).scalar()
+                if ref_count > 0:
+                    db.commit()
+                    return
+            
+            try:
+                self._delete_object(url)
+            except ClientError as e:
+                # Drop the row anyway: an orphaned object is overwritten by the next upload of its content
+                logger.error(f"Failed to delete file {url}: {str(e)}")
+            if updated:
+                db.query(Artifact).filter(Artifact.url == url).delete(synchronize_session=False)
+                db.commit()
+        finally:
+            db.close()
     
     async def download_file(self, key: str) -> bytes:
         """Download file from S3"""
@@ -80,9 +116,73 @@ class StorageService:
             return response['Body'].read()
         except ClientError as e:
             raise Exception(f"Failed to download file: {str(e)}")
-
-
-
-
-
-
+    
+    def _spool(self, file_obj: BinaryIO, spool) -> Tuple[str, int]:
+        """Copy an upload into spool in chunks, hashing as it goes; returns (sha256, size)"""
+        if file_obj.seekable():
+            file_obj.seek(0)
+        digest = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = file_obj.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            spool.write(chunk)
+            size += len(chunk)
+        return digest.hexdigest(), size
+    
+    def _acquire(self, db, sha256: str) -> Optional[str]:
+        """Add a reference to stored content; returns its URL, None if it isn't stored"""
+        updated = db.query(Artifact).filter(Artifact.sha256 == sha256).update(
+            {Artifact.ref_count: Artifact.ref_count + 1}, synchronize_session=False
+        )
+        db.commit()
+        if not updated:
+            return None
+        return db.query(Artifact.url).filter(Artifact.sha256 == sha256).scalar()
+    
+    def _register(self, db, sha256: str, url: str, size: int) -> str:
+        """Record newly stored content with one reference; returns its URL"""
+        db.add(Artifact(sha256=sha256, url=url, size=size, ref_count=1))
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent upload of the same content registered it first. Both wrote the
+            # same bytes to the same key, so just take a reference on theirs
+            db.rollback()
+            return self._acquire(db, sha256) or url
+        return url
+    
+    def _put_object(self, file_obj: BinaryIO, sha256: str, ext: str) -> str:
+        """Write content under its hash and return its URL"""
+        if self.has_s3_config:
+            key = f"objects/{sha256[:2]}/{sha256}{ext}"
+            self.s3_client.upload_fileobj(
+                file_obj,
+                self.bucket_name,
+                key,
+                ExtraArgs={'ACL': 'public-read'}
+            )
+            # Return public URL
+            return f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{key}"
+        
+        # Local storage for development, served by the backend
+        file_name = f"{sha256}{ext}"
+        with open(os.path.join(self.local_storage_dir, file_name), 'wb') as f:
+            while True:
+                chunk = file_obj.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+        return f"{settings.API_BASE_URL}/local_storage/uploads/{file_name}"
+    
+    def _delete_object(self, url: str):
+        if self.has_s3_config:
+            # Extract key from URL
+            key = url.split(f"{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/")[-1]
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=key)
+        else:
+            file_path = os.path.join(self.local_storage_dir, os.path.basename(url))
+            if os.path.exists(file_path):
+                os.remove(file_path)
@@ -1,15 +1,429 @@
 import ffmpeg
+import asyncio
 import os
 import tempfile
-from typing import List, Dict, Optional
+import logging
+from fractions import Fraction
+from typing import Callable, List, Dict, Optional, Tuple
 from pathlib import Path
+from app.services.beat_tracker import beat_tracker, snap_cuts_to_beats
+from app.services.render_plan import RenderPlan, THUMBNAIL_BATCH_FRAMES
+from app.services.render_scheduler import RenderScheduler, render_scheduler
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# House mezzanine format provider clips are normalized to on ingest; every render is
+# also resampled to MEZZANINE_FPS, whether it is encoded in one pass or in segments
+MEZZANINE_FPS = 30
+MEZZANINE_GOP = 30  # frames: one closed GOP per second
+MEZZANINE_SAMPLE_RATE = 48000
+MEZZANINE_CHANNELS = 2
+# Container comment tagging normalize_clip output: clips with this tag and identical stream
+# parameters were encoded with identical settings, so they join with stream copy
+MEZZANINE_TAG = "mezzanine/1"
+
+# Job audio bed (see premix_audio): loudness target for social platforms and
+# sidechain ducking of the music under the voiceover
+AUDIO_LOUDNESS = {"I": -14, "TP": -1.5, "LRA": 11}  # LUFS, dBTP, LU
+AUDIO_DUCKING = {"threshold": 0.05, "ratio": 8, "attack": 20, "release": 400}  # attack/release in ms
+
+# How subtitles reach the output: "burn" draws them into the picture with libass,
+# "soft" muxes a mov_text track for players/platforms that render captions themselves
+SUBTITLE_MODES = ("burn", "soft")
+
+# Storyboard shot transitions: name -> xfade transition (any other name is a hard cut)
+TRANSITIONS = {
+    "fade": "fade",
+    "dissolve": "dissolve",
+    "slide": "slideleft",
+    "wipe": "wipeleft",
+}
+TRANSITION_DURATION = 0.5  # seconds
+
+# Output dimensions for the supported aspect ratios
+ASPECT_RATIO_DIMENSIONS = {
+    "9:16": (1080, 1920),
+    "1:1": (1080, 1080),
+    "16:9": (1920, 1080),
+}
+
+
+# Named encode settings, selectable per job via options["render_profile"]
+# max_size caps the long side of the output (None renders at ASPECT_RATIO_DIMENSIONS)
+RENDER_PROFILES = {
+    "draft": {"preset": "ultrafast", "crf": 32, "max_size": 640, "audio_bitrate": "64k"},
+    "preview": {"preset": "veryfast", "crf": 28, "max_size": 960, "audio_bitrate": "96k"},
+    "final": {"preset": "medium", "crf": 23, "max_size": None, "audio_bitrate": "128k"},
+}
+
+
+def render_dimensions(aspect_ratio: str, profile: str = "final") -> Tuple[int, int]:
+    """Output size for an aspect ratio under a render profile's resolution cap"""
+    width, height = ASPECT_RATIO_DIMENSIONS.get(aspect_ratio, (1920, 1080))
+    max_size = RENDER_PROFILES[profile]["max_size"]
+    if max_size and max(width, height) > max_size:
+        scale = max_size / max(width, height)
+        # Even dimensions for yuv420p
+        width, height = int(width * scale) // 2 * 2, int(height * scale) // 2 * 2
+    return width, height
+
+
+def aspect_ratio_value(aspect_ratio: str) -> float:
+    """Convert "W:H" to width / height"""
+    width, height = aspect_ratio.split(":")
+    return float(width) / float(height)
+
+
+def widest_aspect_ratio(aspect_ratios: List[str]) -> str:
+    """Pick the aspect ratio every other one can be center-cropped from (largest width / height)"""
+    return max(aspect_ratios, key=aspect_ratio_value)
 
 
 class VideoProcessor:
-    def __init__(self):
+    """
+    ffmpeg operations for rendering jobs. Encodes run as subprocesses through the
+    RenderScheduler, which caps concurrent encodes and threads per encode on the host.
+    """
+    
+    def __init__(self, scheduler: Optional[RenderScheduler] = None):
         self.temp_dir = tempfile.mkdtemp()
+        self.scheduler = scheduler or render_scheduler
+        # One entry per ffmpeg run: step, frames, fps, out_time, speed, elapsed
+        self.encode_stats: List[Dict] = []
+        # ffprobe results by path: a render reads durations and stream parameters of the same
+        # clips (a processor serves one job stage, whose input files don't change)
+        self._probes: Dict[str, Dict] = {}
+    
+    async def render(
+        self,
+        clip_paths: List[str],
+        output_path: str,
+        aspect_ratio: str,
+        subtitles: Optional[List[Dict]] = None,
+        voiceover_path: Optional[str] = None,
+        music_path: Optional[str] = None,
+        music_volume: float = 0.3,
+        subtitle_style: str = "large_centered",
+        crop_to_aspect_ratio: bool = False,
+        thumbnail_path: Optional[str] = None,
+        representative_thumbnail: bool = False,
+        profile: str = "final",
+        on_progress: Optional[Callable[[float], None]] = None,
+        premixed_audio_path: Optional[str] = None,
+        subtitle_mode: str = "burn",
+        beats: Optional[List[float]] = None,
+        transitions: Optional[List[str]] = None
+    ) -> str:
+        """
+        Render the final video for one aspect ratio in a single ffmpeg pass:
+        concat, subtitle burn-in, voiceover/music mix and scale/pad compiled into
+        one filtergraph and one encode (replaces combine_clips -> add_subtitles ->
+        add_audio -> resize_video and their intermediate files)
+        crop_to_aspect_ratio: center-crop clips rendered at another ratio (master clips)
+        profile: RENDER_PROFILES entry; "preview"/"draft" render a low-res proxy fast
+        Timelines of at least RENDER_SEGMENT_MIN_DURATION seconds without transitions are
+        encoded segment-parallel (see _render_segmented); clips already in the output
+        format are stream-copied (see _clips_match_output)
+        on_progress: called with the encoded fraction (0-1) of the timeline as ffmpeg reports it
+        premixed_audio_path: job audio bed from premix_audio, muxed with stream copy instead
+        of mixing voiceover_path/music_path in this render
+        subtitle_mode: SUBTITLE_MODES entry; "soft" skips the libass pass
+        beats: music beat times (seconds); the cuts between clips snap to the nearest ones
+        and the subtitle cues move with them
+        transitions[i]: TRANSITIONS name between clip i and i + 1 (None/"cut" = hard cut),
+        cross-faded in the same filtergraph
+        """
+        width, height = render_dimensions(aspect_ratio, profile)
+        plan = RenderPlan(width, height)
+        plan.set_output_options(**self._encode_options(profile))
+        plan.set_frame_rate(MEZZANINE_FPS)
+        plan.add_clips(
+            clip_paths,
+            crop_ratio=aspect_ratio_value(aspect_ratio) if crop_to_aspect_ratio else None
+        )
+        shot_durations = await self._set_timeline(plan, subtitles, subtitle_style, subtitle_mode, beats, transitions)
+        duration = sum(shot_durations)
+        if premixed_audio_path:
+            plan.set_premixed_audio(premixed_audio_path, duration)
+        elif voiceover_path:
+            plan.set_audio(voiceover_path, music_path, music_volume, duration)
+        if thumbnail_path:
+            plan.set_thumbnail(thumbnail_path, representative_thumbnail)
+        
+        min_duration = settings.RENDER_SEGMENT_MIN_DURATION
+        # Transitions blend across shot boundaries, so their timelines can't be split there
+        if await self._clips_match_output(plan):
+            logger.info(f"Stream-copying {len(clip_paths)} clips already in the {width}x{height} output format")
+            concat_file = self._write_concat_file(plan.clip_paths, f"clips_{os.path.basename(output_path)}.txt")
+            await self._run(
+                plan.build_copy(concat_file, output_path),
+                "render_copy",
+                self._timeline_progress(duration, on_progress) if on_progress else None
+            )
+            return output_path
+        
+        if min_duration and len(clip_paths) > 1 and duration >= min_duration and not any(plan.transitions):
+            return await self._render_segmented(plan, output_path, shot_durations, on_progress)
+        
+        await self._run(
+            plan.build(output_path),
+            "render",
+            self._timeline_progress(duration, on_progress) if on_progress else None
+        )
+        
+        return output_path
+    
+    async def _render_segmented(
+        self,
+        plan: RenderPlan,
+        output_path: str,
+        durations: List[float],
+        on_progress: Optional[Callable[[float], None]] = None
+    ) -> str:
+        """
+        Segment-parallel render: split the timeline at shot (clip) boundaries, encode every
+        segment as its own ffmpeg process (the scheduler spreads them over the host's encode
+        slots), then join them with a stream-copy concat and mux the audio mix once.
+        Latency scales with cores instead of timeline length.
+        durations: rendered length of each clip (the timeline has no transitions)
+        """
+        offsets = [sum(durations[:i]) for i in range(len(durations))]
+        
+        segment_paths = [
+            os.path.join(self.temp_dir, f"segment_{i}_{os.path.basename(output_path)}")
+            for i in range(len(plan.clip_paths))
+        ]
+        
+        # Segments encode concurrently: progress is the sum of their encoded time
+        total = sum(durations) or 1.0
+        encoded = [0.0] * len(segment_paths)
+        
+        def segment_progress(i: int):
+            def report(progress: Dict):
+                if on_progress and progress.get("out_time") is not None:
+                    encoded[i] = progress["out_time"]
+                    on_progress(min(1.0, sum(encoded) / total))
+            return report
+        
+        await asyncio.gather(*(
+            self._run(
+                plan.segment(i, offsets[i], plan.frame_rate).build(segment_path),
+                f"render_segment_{i}",
+                segment_progress(i)
+            )
+            for i, segment_path in enumerate(segment_paths)
+        ))
+        
+        concat_file = self._write_concat_file(segment_paths, f"segments_{os.path.basename(output_path)}.txt")
+        await self._run(plan.build_mux(concat_file, output_path), "render_mux")
+        
+        for segment_path in segment_paths:
+            os.remove(segment_path)
+        
+        return output_path
+    
+    async def _clips_match_output(self, plan: RenderPlan) -> bool:
+        """
+        Whether a plan's clips can be stream-copied into its output: the picture needs no
+        filtering, and every clip is a mezzanine clip (normalize_clip) with the same
+        stream parameters, at the output size and frame rate. Clips encoded elsewhere are
+        always re-encoded: matching parameters don't guarantee matching H.264 parameter
+        sets across the joins
+        """
+        if plan.filters_picture() or not plan.frame_rate:
+            return False
+        signatures = await asyncio.gather(*(self.probe_clip(path) for path in plan.clip_paths))
+        reference = signatures[0]
+        return (
+            reference["mezzanine"]
+            and all(signature == reference for signature in signatures)
+            and (reference["width"], reference["height"]) == (plan.width, plan.height)
+            and bool(reference["fps"]) and Fraction(reference["fps"]) == plan.frame_rate
+        )
+    
+    async def clip_duration(self, video_path: str) -> float:
+        """Container duration of a clip in seconds"""
+        probe = await self._probe(video_path)
+        return float(probe["format"]["duration"])
+    
+    async def _probe(self, video_path: str) -> Dict:
+        if video_path not in self._probes:
+            # ffprobe blocks; keep it off the event loop
+            self._probes[video_path] = await asyncio.to_thread(ffmpeg.probe, video_path)
+        return self._probes[video_path]
+    
+    async def _set_timeline(
+        self,
+        plan: RenderPlan,
+        subtitles: Optional[List[Dict]],
+        subtitle_style: str,
+        subtitle_mode: str,
+        beats: Optional[List[float]],
+        transitions: Optional[List[str]] = None
+    ) -> List[float]:
+        """
+        Set the plan's transitions, snap the cuts between its clips to the beats (when
+        given), then lay the subtitles out on the resulting shot timeline, so the cues
+        move with the cuts. A transition's cut point is the middle of its cross-fade.
+        Returns the on-screen duration of each shot; they sum to the rendered length
+        """
+        durations = list(await asyncio.gather(*(self.clip_duration(path) for path in plan.clip_paths)))
+        xfades = [TRANSITIONS.get(name) for name in (transitions or [])[:len(durations) - 1]]
+        if any(xfades):
+            plan.set_transitions(xfades, TRANSITION_DURATION)
+        
+        # On-screen length of each shot, from cut point to cut point
+        overlaps = [0.0] + plan.transition_overlaps(durations) + [0.0]
+        shown = [duration - (overlaps[i] + overlaps[i + 1]) / 2 for i, duration in enumerate(durations)]
+        if beats:
+            snapped = snap_cuts_to_beats(shown, beats)
+            logger.info(f"Snapped {len(snapped) - 1} cuts to beats: shot durations {shown} -> {snapped}")
+            shown = snapped
+        if beats or any(xfades):
+            plan.set_clip_durations([
+                duration + (overlaps[i] + overlaps[i + 1]) / 2 for i, duration in enumerate(shown)
+            ])
+        if subtitles:
+            plan.set_subtitles(
+                self._write_srt(self._retime_subtitles(subtitles, shown)),
+                self._subtitle_style(subtitle_style),
+                soft=subtitle_mode == "soft"
+            )
+        return shown
+    
+    def _retime_subtitles(self, subtitles: List[Dict], durations: List[float]) -> List[Dict]:
+        """
+        Move one-cue-per-shot subtitles (StoryboardService.generate_subtitles, timed from
+        the storyboard's suggested durations) onto the rendered shots; any other cue list
+        is kept as it is
+        """
+        if len(subtitles) != len(durations):
+            return subtitles
+        starts = [sum(durations[:i]) for i in range(len(durations))]
+        return [
+            {**cue, "start_time": round(start, 3), "end_time": round(start + duration, 3)}
+            for cue, start, duration in zip(subtitles, starts, durations)
+        ]
+    
+    def _timeline_progress(self, duration: float, on_progress: Callable[[float], None]) -> Callable[[Dict], None]:
+        """Adapt ffmpeg progress reports to the encoded fraction of a timeline of duration seconds"""
+        total = duration or 1.0
+        
+        def report(progress: Dict):
+            if progress.get("out_time") is not None:
+                on_progress(min(1.0, progress["out_time"] / total))
+        return report
+    
+    async def _run(self, stream, step: str, on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Run an ffmpeg spec through the scheduler and keep its throughput stats"""
+        stats = await self.scheduler.run(stream, on_progress)
+        self.encode_stats.append({"step": step, **stats})
+        return stats
+    
+    async def render_multi(
+        self,
+        clip_paths: List[str],
+        output_paths: Dict[str, str],
+        source_aspect_ratio: str,
+        subtitles: Optional[List[Dict]] = None,
+        voiceover_path: Optional[str] = None,
+        music_path: Optional[str] = None,
+        music_volume: float = 0.3,
+        subtitle_style: str = "large_centered",
+        thumbnail_path: Optional[str] = None,
+        representative_thumbnail: bool = False,
+        profile: str = "final",
+        on_progress: Optional[Callable[[float], None]] = None,
+        premixed_audio_path: Optional[str] = None,
+        subtitle_mode: str = "burn",
+        beats: Optional[List[float]] = None,
+        transitions: Optional[List[str]] = None
+    ) -> Dict[str, str]:
+        """
+        Render several aspect ratios from one clip timeline in a single ffmpeg process:
+        the clips are decoded and concatenated once at source_aspect_ratio, then split
+        into a crop/scale/pad branch per output; the audio mix is shared
+        output_paths: aspect ratio -> output path; the thumbnail comes from the first one
+        profile: RENDER_PROFILES entry, applied to every output
+        on_progress: called with the encoded fraction (0-1) of the timeline
+        premixed_audio_path: job audio bed from premix_audio, stream-copied into every output
+        subtitle_mode: SUBTITLE_MODES entry, applied to every output
+        beats: music beat times (seconds); the cuts between clips snap to the nearest ones
+        and the subtitle cues move with them
+        transitions[i]: TRANSITIONS name between clip i and i + 1 (None/"cut" = hard cut),
+        cross-faded in the same filtergraph
+        """
+        width, height = render_dimensions(source_aspect_ratio, profile)
+        plan = RenderPlan(width, height)
+        plan.set_output_options(**self._encode_options(profile))
+        plan.set_frame_rate(MEZZANINE_FPS)
+        plan.add_clips(clip_paths)
+        for aspect_ratio, output_path in output_paths.items():
+            out_width, out_height = render_dimensions(aspect_ratio, profile)
+            crop_ratio = None
+            if aspect_ratio != source_aspect_ratio:
+                crop_ratio = aspect_ratio_value(aspect_ratio)
+            plan.add_output(output_path, out_width, out_height, crop_ratio)
+        duration = sum(await self._set_timeline(plan, subtitles, subtitle_style, subtitle_mode, beats, transitions))
+        if premixed_audio_path:
+            plan.set_premixed_audio(premixed_audio_path, duration)
+        elif voiceover_path:
+            plan.set_audio(voiceover_path, music_path, music_volume, duration)
+        if thumbnail_path:
+            plan.set_thumbnail(thumbnail_path, representative_thumbnail)
+        
+        await self._run(
+            plan.build_outputs(),
+            "render_multi",
+            self._timeline_progress(duration, on_progress) if on_progress else None
+        )
+        
+        return output_paths
+    
+    async def premix_audio(
+        self,
+        voiceover_path: str,
+        output_path: str,
+        music_path: Optional[str] = None,
+        duration: Optional[float] = None,
+        music_volume: float = 0.3
+    ) -> str:
+        """
+        Mix the job's audio bed once, for every aspect ratio to mux with stream copy:
+        music at music_volume and ducked under the voiceover (sidechain compression keyed
+        by the voice), mixed with the voiceover at full level, loudness-normalized to
+        AUDIO_LOUDNESS and encoded as 48 kHz AAC
+        duration: pad the voiceover with silence to at least this many seconds, so the
+        bed covers the whole timeline (renders stop at the end of the picture)
+        """
+        voice = ffmpeg.input(voiceover_path).audio
+        if duration:
+            voice = voice.filter("apad", whole_dur=duration)
+        
+        if music_path:
+            voice_split = voice.asplit()
+            voice, voice_key = voice_split[0], voice_split[1]
+            music = ffmpeg.input(music_path).audio.filter("volume", volume=music_volume)
+            ducked = ffmpeg.filter([music, voice_key], "sidechaincompress", **AUDIO_DUCKING)
+            # The voiceover (padded to duration) sets the length of the mix
+            audio = ffmpeg.filter([voice, ducked], "amix", inputs=2, duration="first", normalize=0)
+        else:
+            audio = voice
+        
+        audio = (
+            audio
+            .filter("loudnorm", **AUDIO_LOUDNESS)
+            # loudnorm resamples internally to 192 kHz
+            .filter("aresample", 48000)
+        )
+        stream = ffmpeg.output(audio, output_path, acodec="aac", audio_bitrate="192k", ar=48000)
+        await self._run(stream, "premix_audio")
+        
+        return output_path
     
-    def combine_clips(
+    async def combine_clips(
         self,
         video_paths: List[str],
         output_path: str,
@@ -21,47 +435,133 @@ class VideoProcessor:
         if not video_paths:
             raise ValueError("No video clips provided")
         
-        # Create concat file for FFmpeg
-        concat_file = os.path.join(self.temp_dir, "concat.txt")
-        with open(concat_file, "w") as f:
-            for video_path in video_paths:
-                f.write(f"file '{os.path.abspath(video_path)}'\n")
-        
-        # Build FFmpeg command
+        concat_file = self._write_concat_file(video_paths, "concat.txt")
         stream = ffmpeg.input(concat_file, format="concat", safe=0)
-        stream = ffmpeg.output(stream, output_path, vcodec="libx264", acodec="aac")
-        ffmpeg.run(stream, overwrite_output=True, quiet=True)
+        stream = ffmpeg.output(stream, output_path, vcodec="libx264", acodec="aac", threads=self.scheduler.threads)
+        await self._run(stream, "combine_clips")
         
         return output_path
     
-    def add_subtitles(
+    async def normalize_clip(
+        self,
+        video_path: str,
+        output_path: str,
+        size: Optional[Tuple[int, int]] = None
+    ) -> str:
+        """
+        Conform a provider clip to the house mezzanine format: H.264 yuv420p at a fixed
+        frame rate with a fixed closed GOP, and a 48 kHz stereo AAC track (silent when the
+        provider returned none), tagged MEZZANINE_TAG
+        size: (width, height) to scale and pad to, normally the render size of the clip's
+        aspect ratio: renders at that size stream-copy the clip (see _clips_match_output)
+        """
+        signature = await self.probe_clip(video_path)
+        source = ffmpeg.input(video_path)
+        video = source.video.filter("fps", fps=MEZZANINE_FPS)
+        if size:
+            video = (
+                video
+                .filter("scale", size[0], size[1], force_original_aspect_ratio="decrease")
+                .filter("pad", size[0], size[1], "(ow-iw)/2", "(oh-ih)/2")
+            )
+        else:
+            # Even dimensions for yuv420p
+            video = video.filter("scale", "trunc(iw/2)*2", "trunc(ih/2)*2")
+        video = video.filter("setsar", 1)
+        if signature["acodec"]:
+            audio = source.audio
+        else:
+            audio = ffmpeg.input(
+                f"anullsrc=r={MEZZANINE_SAMPLE_RATE}:cl=stereo",
+                f="lavfi"
+            ).audio
+        
+        stream = ffmpeg.output(
+            video,
+            audio,
+            output_path,
+            vcodec="libx264",
+            threads=self.scheduler.threads,
+            pix_fmt="yuv420p",
+            preset="veryfast",
+            crf=18,
+            g=MEZZANINE_GOP,
+            keyint_min=MEZZANINE_GOP,
+            sc_threshold=0,
+            video_track_timescale=MEZZANINE_FPS * 512,
+            acodec="aac",
+            ar=MEZZANINE_SAMPLE_RATE,
+            ac=MEZZANINE_CHANNELS,
+            shortest=None,
+            movflags="+faststart",
+            metadata=f"comment={MEZZANINE_TAG}"
+        )
+        await self._run(stream, "normalize_clip")
+        
+        return output_path
+    
+    async def probe_clip(self, video_path: str) -> Dict:
+        """
+        Probe a clip's video and audio stream parameters, and whether normalize_clip
+        wrote it (audio fields are None when the clip has no audio)
+        """
+        probe = await self._probe(video_path)
+        video = next((s for s in probe["streams"] if s["codec_type"] == "video"), None)
+        if not video:
+            raise Exception(f"No video stream in {video_path}")
+        audio = next((s for s in probe["streams"] if s["codec_type"] == "audio"), None)
+        
+        return {
+            "vcodec": video.get("codec_name"),
+            "profile": video.get("profile"),
+            "width": int(video["width"]),
+            "height": int(video["height"]),
+            "pix_fmt": video.get("pix_fmt"),
+            "fps": video.get("r_frame_rate"),
+            "time_base": video.get("time_base"),
+            "acodec": audio.get("codec_name") if audio else None,
+            "sample_rate": int(audio["sample_rate"]) if audio else None,
+            "channels": int(audio["channels"]) if audio else None,
+            "mezzanine": probe["format"].get("tags", {}).get("comment") == MEZZANINE_TAG,
+        }
+    
+    def _write_concat_file(self, video_paths: List[str], name: str) -> str:
+        """Write an ffmpeg concat demuxer list"""
+        concat_file = os.path.join(self.temp_dir, name)
+        with open(concat_file, "w") as f:
+            for video_path in video_paths:
+                f.write(f"file '{os.path.abspath(video_path)}'\n")
+        return concat_file
+    
+    async def add_subtitles(
         self,
         video_path: str,
         subtitles: List[Dict],
         output_path: str,
-        style: str = "large_centered"
+        style: str = "large_centered",
+        mode: str = "burn"
     ) -> str:
         """
         Add subtitles to video
         subtitles: [{"text": "...", "start_time": 0, "end_time": 5}, ...]
+        mode: "burn" re-encodes the video with the subtitles drawn in; "soft" stream-copies
+        it and adds a mov_text track (style doesn't apply)
         """
-        # Create SRT file
-        srt_file = os.path.join(self.temp_dir, "subtitles.srt")
-        with open(srt_file, "w", encoding="utf-8") as f:
-            for i, subtitle in enumerate(subtitles, 1):
-                start = self._format_timestamp(subtitle["start_time"])
-                end = self._format_timestamp(subtitle["end_time"])
-                f.write(f"{i}\n{start} --> {end}\n{subtitle['text']}\n\n")
-        
-        # Apply subtitle style based on style parameter
-        if style == "large_centered":
-            subtitle_style = (
-                "FontName=Arial,FontSize=48,PrimaryColour=&Hffffff,"
-                "OutlineColour=&H000000,Outline=2,Alignment=10"
+        srt_file = self._write_srt(subtitles)
+        if mode == "soft":
+            stream = ffmpeg.output(
+                ffmpeg.input(video_path),
+                ffmpeg.input(srt_file),
+                output_path,
+                vcodec="copy",
+                acodec="copy",
+                scodec="mov_text"
             )
-        else:
-            subtitle_style = "FontName=Arial,FontSize=36,PrimaryColour=&Hffffff"
+            await self._run(stream, "add_subtitles")
+            return output_path
         
+        subtitle_style = self._subtitle_style(style)
+                
         # Add subtitles to video
         stream = ffmpeg.input(video_path)
         stream = ffmpeg.output(
@@ -69,13 +569,14 @@ class VideoProcessor:
             output_path,
             vf=f"subtitles={srt_file}:force_style='{subtitle_style}'",
             vcodec="libx264",
+            threads=self.scheduler.threads,
             acodec="copy"
         )
-        ffmpeg.run(stream, overwrite_output=True, quiet=True)
+        await self._run(stream, "add_subtitles")
         
         return output_path
     
-    def add_audio(
+    async def add_audio(
         self,
         video_path: str,
         audio_path: str,
@@ -90,11 +591,9 @@ class VideoProcessor:
         audio = ffmpeg.input(audio_path)
         
         if music_path:
-            music = ffmpeg.input(music_path)
-            # Mix voiceover and music
-            audio = ffmpeg.filter([audio, music], "amix", inputs=2, duration="longest")
-            # Adjust music volume
-            audio = ffmpeg.filter(audio, "volume", volume=music_volume)
+            # Turn down only the music, then mix it under the voiceover at full level
+            music = ffmpeg.filter(ffmpeg.input(music_path), "volume", volume=music_volume)
+            audio = ffmpeg.filter([audio, music], "amix", inputs=2, duration="longest", normalize=0)
         
         stream = ffmpeg.output(
             video,
@@ -104,69 +603,112 @@ class VideoProcessor:
             acodec="aac",
             strict="experimental"
         )
-        ffmpeg.run(stream, overwrite_output=True, quiet=True)
+        await self._run(stream, "add_audio")
         
         return output_path
     
-    def resize_video(
+    async def resize_video(
         self,
         video_path: str,
         output_path: str,
         aspect_ratio: str,
         width: int = None,
-        height: int = None
+        height: int = None,
+        thumbnail_path: Optional[str] = None,
+        representative_thumbnail: bool = False
     ) -> str:
         """
         Resize video to specific aspect ratio
         aspect_ratio: "9:16", "1:1", "16:9"
+        If thumbnail_path is given, a JPEG thumbnail of the resized video is written
+        by the same ffmpeg run (no second decode)
         """
         # Calculate dimensions
-        if aspect_ratio == "9:16":
-            target_width, target_height = 1080, 1920
-        elif aspect_ratio == "1:1":
-            target_width, target_height = 1080, 1080
-        elif aspect_ratio == "16:9":
-            target_width, target_height = 1920, 1080
+        if aspect_ratio in ASPECT_RATIO_DIMENSIONS:
+            target_width, target_height = ASPECT_RATIO_DIMENSIONS[aspect_ratio]
         else:
             target_width, target_height = width or 1920, height or 1080
         
+        scale_filter = f"scale={target_width}:{target_height}:force_original_aspect_ratio=decrease,pad={target_width}:{target_height}:(ow-iw)/2:(oh-ih)/2"
+        
         stream = ffmpeg.input(video_path)
-        stream = ffmpeg.output(
+        output = ffmpeg.output(
             stream,
             output_path,
-            vf=f"scale={target_width}:{target_height}:force_original_aspect_ratio=decrease,pad={target_width}:{target_height}:(ow-iw)/2:(oh-ih)/2",
+            vf=scale_filter,
             vcodec="libx264",
+            threads=self.scheduler.threads,
             acodec="copy"
         )
-        ffmpeg.run(stream, overwrite_output=True, quiet=True)
+        if thumbnail_path:
+            output = ffmpeg.merge_outputs(
+                output,
+                self._thumbnail_output(stream, thumbnail_path, representative_thumbnail, scale_filter)
+            )
+        await self._run(output, "resize_video")
         
         return output_path
     
-    def sync_to_beat(
+    def _thumbnail_output(self, stream, output_path: str, representative: bool, video_filter: Optional[str] = None):
+        """Build a single-frame JPEG output for an input stream"""
+        filters = [video_filter] if video_filter else []
+        if representative:
+            # Scores each batch of frames against the batch average and keeps the closest one
+            filters.append(f"thumbnail={THUMBNAIL_BATCH_FRAMES}")
+        
+        kwargs = {"vf": ",".join(filters)} if filters else {}
+        return ffmpeg.output(stream.video, output_path, vframes=1, **kwargs)
+    
+    async def sync_to_beat(
         self,
-        video_path: str,
+        clip_paths: List[str],
         audio_path: str,
-        output_path: str
+        output_path: str,
+        aspect_ratio: str = "9:16"
     ) -> str:
         """
-        Sync video cuts to music beat
+        Sync video cuts to music beat: track the music's beats (cached per track), cut
+        the clips on the nearest ones and lay the music under them, in one render
         """
-        # Extract audio for beat detection
-        audio_stream = ffmpeg.input(audio_path)
-        
-        # This is a simplified version - in production, use audio analysis
-        # to detect beats and adjust video cuts accordingly
-        video = ffmpeg.input(video_path)
-        stream = ffmpeg.output(
-            video,
-            audio_stream,
+        grid = await beat_tracker.beat_grid(audio_path)
+        return await self.render(
+            clip_paths,
             output_path,
-            vcodec="libx264",
-            acodec="aac"
+            aspect_ratio,
+            voiceover_path=audio_path,
+            beats=grid["beats"]
         )
-        ffmpeg.run(stream, overwrite_output=True, quiet=True)
-        
-        return output_path
+    
+    def _encode_options(self, profile: str) -> Dict:
+        """ffmpeg output options for a render profile"""
+        if profile not in RENDER_PROFILES:
+            raise ValueError(f"Unknown render profile: {profile}")
+        encode = RENDER_PROFILES[profile]
+        return {
+            "preset": encode["preset"],
+            "crf": encode["crf"],
+            "audio_bitrate": encode["audio_bitrate"],
+            "threads": self.scheduler.threads,
+        }
+    
+    def _write_srt(self, subtitles: List[Dict]) -> str:
+        """Write subtitles to an SRT file in the temp dir"""
+        srt_file = os.path.join(self.temp_dir, "subtitles.srt")
+        with open(srt_file, "w", encoding="utf-8") as f:
+            for i, subtitle in enumerate(subtitles, 1):
+                start = self._format_timestamp(subtitle["start_time"])
+                end = self._format_timestamp(subtitle["end_time"])
+                f.write(f"{i}\n{start} --> {end}\n{subtitle['text']}\n\n")
+        return srt_file
+    
+    def _subtitle_style(self, style: str) -> str:
+        """libass force_style for a subtitle style name"""
+        if style == "large_centered":
+            return (
+                "FontName=Arial,FontSize=48,PrimaryColour=&Hffffff,"
+                "OutlineColour=&H000000,Outline=2,Alignment=10"
+            )
+        return "FontName=Arial,FontSize=36,PrimaryColour=&Hffffff"
     
     def _format_timestamp(self, seconds: float) -> str:
         """Convert seconds to SRT timestamp format"""
@@ -1,7 +1,10 @@
-from celery import Celery
+from celery import Celery, chain, chord, group
+from celery.signals import worker_process_shutdown
 from app.core.config import settings
 from app.db.database import SessionLocal
 from app.db.models import Job, JobStatus
+from app.core.http_clients import http_clients
+from sqlalchemy.orm.attributes import flag_modified
 from app.services.ai_storyboard import StoryboardService
 from app.services.image_enhancement import ImageEnhancementService
 from app.services.seedream_video import SeedreamVideoService
@@ -9,14 +12,20 @@ from app.services.openai_video import OpenAIVideoService
 from app.services.kling_video import KlingVideoService
 from app.services.veo3_video import Veo3VideoService
 from app.services.elevenlabs_voice import ElevenLabsVoiceService
-from app.services.video_processor import VideoProcessor
+from app.services.video_processor import VideoProcessor, RENDER_PROFILES, SUBTITLE_MODES, render_dimensions, widest_aspect_ratio
 from app.services.music_selector import MusicSelector
+from app.services.music_library import music_library
+from app.services.beat_tracker import beat_tracker
 from app.services.storage import StorageService
+from app.services.downloads import DownloadService
 import tempfile
 import os
+import shutil
 import asyncio
-import httpx
+import hashlib
 import logging
+import time
+from typing import Callable, Dict, Optional
 from uuid import UUID
 from datetime import datetime
 
@@ -35,357 +44,988 @@ celery_app.conf.result_serializer = "json"
 celery_app.conf.timezone = "UTC"
 celery_app.conf.enable_utc = True
 
+# Network-bound stages (provider calls, polling, uploads) and CPU-bound stages
+# (ffmpeg encodes) are routed to separate queues so each pool can be sized on its own.
+# Both default to the standard "celery" queue, so a single worker still runs everything.
+celery_app.conf.task_routes = {
+    "app.tasks.video_generation.render_aspect_ratio_stage": {"queue": settings.CELERY_CPU_QUEUE},
+    "app.tasks.video_generation.render_all_aspect_ratios_stage": {"queue": settings.CELERY_CPU_QUEUE},
+    "app.tasks.video_generation.render_preview_stage": {"queue": settings.CELERY_CPU_QUEUE},
+    "app.tasks.video_generation.mix_audio_stage": {"queue": settings.CELERY_CPU_QUEUE},
+    "app.tasks.video_generation.*": {"queue": settings.CELERY_IO_QUEUE},
+}
 
-async def _process_video_job_async(job_id: str):
-    """Async video generation workflow"""
-    db = SessionLocal()
-    processor = VideoProcessor()
-    temp_dir = tempfile.mkdtemp()
+
+# One event loop per worker process, reused by every stage it runs, so the pooled
+# provider HTTP clients (and their keep-alive connections) outlive a single task
+_worker_loop = None
+
+
+def _run_async(coro):
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop.run_until_complete(coro)
+
+
+@worker_process_shutdown.connect
+def _close_worker_loop(**kwargs):
+    global _worker_loop
+    if _worker_loop is not None and not _worker_loop.is_closed():
+        _worker_loop.run_until_complete(http_clients.aclose())
+        _worker_loop.close()
+    _worker_loop = None
+
+
+def _update_job_metadata(db, job: Job, update) -> None:
+    """
+    Apply update(metadata) to job_metadata under a row lock and commit.
+    Stages for the same job can run on different workers at the same time, so the
+    row is re-read before writing instead of overwriting it with a stale copy.
+    """
+    db.commit()
+    db.refresh(job, with_for_update=True)
+    metadata = dict(job.job_metadata or {})
+    update(metadata)
+    job.job_metadata = metadata
+    flag_modified(job, "job_metadata")
+    db.commit()
+
+
+def _save_job_metadata(db, job: Job, key: str, value) -> None:
+    """Persist a single job_metadata entry"""
+    _update_job_metadata(db, job, lambda metadata: metadata.__setitem__(key, value))
+
+
+def _merge_job_metadata(db, job: Job, key: str, entries: dict) -> None:
+    """Merge entries into a dict-valued job_metadata entry"""
+    def update(metadata):
+        metadata[key] = {**(metadata.get(key) or {}), **entries}
+    _update_job_metadata(db, job, update)
+
+
+async def _store_job_file(
+    storage: StorageService,
+    file_path: str,
+    key: str,
+    record: Callable[[str], None],
+    replaces: Optional[str] = None
+) -> str:
+    """
+    Upload a stage output and record its URL in the job with record(url). Each upload
+    holds a storage reference that delete_job releases through that record, so when
+    recording fails the reference is released here instead of leaking when the stage
+    retries. replaces: URL this one supersedes (from an earlier attempt), released once
+    the new one is recorded.
+    """
+    with open(file_path, "rb") as f:
+        url = await storage.upload_file(f, key)
+    try:
+        record(url)
+    except Exception:
+        await storage.delete_file(url)
+        raise
+    if replaces:
+        await storage.delete_file(replaces)
+    return url
+
+
+def _set_progress(db, job: Job, progress: int) -> None:
+    """Advance job progress; never moves backwards when stages finish out of order"""
+    db.commit()
+    db.refresh(job, with_for_update=True)
+    job.progress = max(job.progress or 0, progress)
+    db.commit()
+
+
+def _encode_progress(db, job: Job, start: int, end: int):
+    """
+    Progress callback for an encode: maps the encoded fraction (0-1) onto job progress
+    between start and end, writing to the job at most every PROGRESS_UPDATE_INTERVAL seconds
+    """
+    last_update = [0.0]
     
+    def report(fraction: float):
+        now = time.monotonic()
+        if now - last_update[0] < settings.PROGRESS_UPDATE_INTERVAL:
+            return
+        last_update[0] = now
+        _set_progress(db, job, start + int((end - start) * fraction))
+    return report
+
+
+def _save_encode_stats(db, job: Job, key: str, processor: VideoProcessor) -> None:
+    """Record per-encode throughput (fps, speed multiple, wall time) for a render"""
+    _merge_job_metadata(db, job, "encode_stats", {key: processor.encode_stats})
+    for stats in processor.encode_stats:
+        logger.info(
+            f"Encode stats job={job.id} render={key} step={stats['step']} frames={stats.get('frame')} "
+            f"fps={stats.get('fps')} speed={stats.get('speed')} elapsed={stats.get('elapsed')}"
+        )
+
+
+def _thumbnail_mode(job: Job) -> str:
+    """Thumbnail frame selection for a job: "first" frame or most "representative" frame"""
+    return (job.options or {}).get("thumbnail_mode", settings.THUMBNAIL_MODE)
+
+
+def _subtitle_mode(job: Job) -> str:
+    """Subtitle mode for a job (see SUBTITLE_MODES): per-job option, else the deployment default"""
+    mode = (job.options or {}).get("subtitle_mode") or settings.SUBTITLE_MODE
+    return mode if mode in SUBTITLE_MODES else "burn"
+
+
+async def _music_beats(job: Job) -> Optional[list]:
+    """
+    Beat grid of the job's music track to snap cuts to: from the catalog index, else
+    tracked once per track and cached. None when beat sync is off or the track can't be read.
+    """
+    if not (job.options or {}).get("beat_sync", settings.BEAT_SYNC_ENABLED):
+        return None
+    music_url = (job.job_metadata.get("music") or {}).get("url")
+    if not music_url:
+        return None
     try:
-        # Get job
-        job = db.query(Job).filter(Job.id == UUID(job_id)).first()
-        if not job:
-            raise Exception(f"Job {job_id} not found")
-        
-        job.status = JobStatus.PROCESSING
-        job.progress = 10
-        db.commit()
-        
-        # Step 1: Enhance images with Nanobanana
-        logger.info(f"Starting image enhancement for job {job_id}")
-        enhancement_service = ImageEnhancementService()
-        enhanced_images = []
-        enhanced_data = []  # Store full enhancement data
-        
-        for idx, img_url in enumerate(job.image_urls):
+        if music_library.available():
+            beats = music_library.beat_grid(music_url)
+            if beats is not None:
+                return beats
+        return (await beat_tracker.beat_grid(music_url))["beats"]
+    except Exception as e:
+        # Best effort: the render keeps the storyboard's cut points
+        logger.warning(f"Failed to get beat grid for {music_url}, cuts won't be beat-synced: {str(e)}")
+        return None
+
+
+def _transitions(job: Job, storyboard: Dict) -> Optional[list]:
+    """Shot transitions from the job's storyboard, None (hard cuts) when transitions are off"""
+    if not (job.options or {}).get("transitions", settings.TRANSITIONS_ENABLED):
+        return None
+    return StoryboardService().generate_transitions(storyboard)
+
+
+def _render_profile(job: Job) -> str:
+    """Render profile for a job (see RENDER_PROFILES): per-job option, else the deployment default"""
+    profile = (job.options or {}).get("render_profile") or settings.RENDER_PROFILE
+    return profile if profile in RENDER_PROFILES else "final"
+
+
+def _get_video_service(video_provider: str):
+    """Get the video generation service for a provider name"""
+    if video_provider == "seedream":
+        return SeedreamVideoService()
+    elif video_provider == "openai":
+        return OpenAIVideoService()
+    elif video_provider == "kling":
+        return KlingVideoService()
+    elif video_provider == "veo3":
+        return Veo3VideoService()
+    raise Exception(f"Unknown video provider: {video_provider}. Supported providers: seedream, openai, kling, veo3")
+
+
+async def _enhance_images_async(db, job: Job, temp_dir: str):
+    """Stage 1: Enhance images with Nanobanana"""
+    job_id = str(job.id)
+    if job.job_metadata and "enhanced_images" in job.job_metadata:
+        logger.info(f"Reusing saved image enhancements for job {job_id}")
+        return
+    
+    logger.info(f"Starting image enhancement for job {job_id}")
+    enhancement_service = ImageEnhancementService()
+    enhancement_semaphore = asyncio.Semaphore(max(1, settings.IMAGE_ENHANCEMENT_MAX_CONCURRENCY))
+    
+    # Get selling points from job metadata if available, or use defaults
+    selling_points = None
+    if job.options and "selling_points" in job.options:
+        selling_points = job.options.get("selling_points")
+    
+    # Content hashes recorded at upload key the enhancement cache (jobs without them aren't cached)
+    image_hashes = (job.job_metadata or {}).get("image_hashes") or []
+    
+    async def enhance_image(idx: int, img_url: str):
+        async with enhancement_semaphore:
             try:
                 logger.info(f"Enhancing image {idx+1}/{len(job.image_urls)}: {img_url}")
                 
-                # Get selling points from job metadata if available, or use defaults
-                selling_points = None
-                if job.options and "selling_points" in job.options:
-                    selling_points = job.options.get("selling_points")
-                
                 # Comprehensive enhancement: clarity, multiple style variations, and annotations
                 enhancement_result = await enhancement_service.enhance_image_comprehensive(
                     image_url=img_url,
                     selling_points=selling_points,
-                    generate_angles=False  # DISABLED: Too expensive - generates 6 variations per image
+                    generate_angles=False,  # DISABLED: Too expensive - generates 6 variations per image
+                    image_hash=image_hashes[idx] if idx < len(image_hashes) else None
                 )
                 
                 # Get enhanced image (only one, not multiple variations)
                 enhanced_url = enhancement_result.get("annotated_url") or \
                              enhancement_result.get("enhanced_url") or \
                              img_url
-                enhanced_images.append(enhanced_url)
-                enhanced_data.append(enhancement_result)
                 
                 logger.info(f"Successfully enhanced image {idx+1}")
-                
+                return enhanced_url, enhancement_result
+            
             except Exception as e:
                 logger.error(f"Failed to enhance image {idx+1}: {str(e)}", exc_info=True)
                 # Fallback to original image if enhancement fails
-                enhanced_images.append(img_url)
-                enhanced_data.append({
+                return img_url, {
                     "enhanced_url": img_url,
                     "angles": [img_url],
                     "annotated_url": None,
                     "error": str(e)
-                })
-        
-        # Store enhancement metadata in job
-        if not job.job_metadata:
-            job.job_metadata = {}
-        job.job_metadata["enhancements"] = enhanced_data
+                }
+    
+    # gather() preserves input order, so results line up with job.image_urls
+    results = await asyncio.gather(
+        *(enhance_image(idx, img_url) for idx, img_url in enumerate(job.image_urls))
+    )
+    
+    # Store enhancement metadata in job
+    def update(metadata):
+        metadata["enhancements"] = [data for _, data in results]  # Store full enhancement data
+        metadata["enhanced_images"] = [url for url, _ in results]
+    _update_job_metadata(db, job, update)
+    
+    _set_progress(db, job, 20)
+    logger.info(f"Image enhancement completed for job {job_id}")
+
+
+async def _generate_storyboard_async(db, job: Job, temp_dir: str):
+    """Stage 2: Generate storyboard with GPT-4"""
+    job_id = str(job.id)
+    if job.job_metadata and "storyboard" in job.job_metadata:
+        logger.info(f"Reusing saved storyboard for job {job_id}")
+        return
+    
+    logger.info(f"Starting storyboard generation for job {job_id}")
+    enhanced_images = list(job.job_metadata["enhanced_images"])
+    enhanced_data = list(job.job_metadata.get("enhancements") or [])
+    
+    storyboard_service = StoryboardService()
+    try:
+        # Cached by the uploaded images' content, which the enhanced images derive from
+        storyboard = await storyboard_service.generate_storyboard(
+            enhanced_images,
+            image_hashes=job.job_metadata.get("image_hashes"),
+            fresh=bool((job.options or {}).get("fresh_storyboard"))
+        )
+    except Exception as e:
+        logger.error(f"Storyboard generation failed for job {job_id}: {str(e)}", exc_info=True)
+        raise Exception(f"Storyboard generation failed: {str(e)}")
+    
+    # Extract selling points from storyboard for later use
+    main_selling_points = storyboard.get("main_selling_points", [])
+    
+    # If we didn't have selling points before, use the ones from storyboard
+    # and enhance images again with annotations
+    if main_selling_points and not any(data.get("annotated_url") for data in enhanced_data):
+        logger.info(f"Re-enhancing images with storyboard selling points")
+        enhancement_service = ImageEnhancementService()
+        enhancement_semaphore = asyncio.Semaphore(max(1, settings.IMAGE_ENHANCEMENT_MAX_CONCURRENCY))
+        image_hashes = job.job_metadata.get("image_hashes") or []
         
-        job.progress = 20
-        db.commit()
-        logger.info(f"Image enhancement completed for job {job_id}")
+        async def annotate_image(idx: int, img_url: str):
+            async with enhancement_semaphore:
+                try:
+                    enhanced_base = enhanced_data[idx].get("enhanced_url") or img_url
+                    # Cache key: the upload's hash, or the clarity result's stand-in hash
+                    image_hash = image_hashes[idx] if idx < len(image_hashes) else None
+                    if enhanced_base != img_url:
+                        image_hash = enhancement_service.clarity_hash(image_hash)
+                    annotated = await enhancement_service.overlay_selling_points(
+                        enhanced_base,
+                        main_selling_points[:3],  # Limit to top 3 selling points
+                        image_hash=image_hash
+                    )
+                    enhanced_data[idx]["annotated_url"] = annotated
+                    enhanced_images[idx] = annotated
+                except Exception as e:
+                    logger.warning(f"Failed to annotate image {idx+1} with selling points: {str(e)}")
         
-        # Step 2: Generate storyboard with GPT-4
-        logger.info(f"Starting storyboard generation for job {job_id}")
-        storyboard_service = StoryboardService()
+        await asyncio.gather(*(
+            annotate_image(idx, img_url)
+            for idx, img_url in enumerate(job.image_urls)
+            if idx < len(enhanced_data)
+        ))
+    
+    # Update job metadata with storyboard
+    def update(metadata):
+        metadata["enhancements"] = enhanced_data
+        metadata["enhanced_images"] = enhanced_images
+        metadata["storyboard"] = storyboard
+    _update_job_metadata(db, job, update)
+    
+    _set_progress(db, job, 30)
+    logger.info(f"Successfully generated storyboard for job {job_id}")
+
+
+async def _generate_clips_async(db, job: Job, temp_dir: str):
+    """Stage 3: Generate videos with selected service"""
+    job_id = str(job.id)
+    storyboard = job.job_metadata["storyboard"]
+    enhanced_images = job.job_metadata["enhanced_images"]
+    
+    # Get video service provider from job options (default to seedream)
+    video_provider = job.options.get("video_provider", "seedream") if job.options else "seedream"
+    logger.info(f"Using video provider: {video_provider} for job {job_id}")
+    video_service = _get_video_service(video_provider)
+    
+    video_clips = []
+    
+    # Check if videos already exist (from previous run that failed downstream)
+    if "video_clips" in job.job_metadata:
+        video_clips = list(job.job_metadata.get("video_clips") or [])
+        logger.info(f"Found {len(video_clips)} saved video clips from previous run. Reusing to avoid wasting credits.")
+    
+    # Master render mode: one clip per shot at the widest requested framing,
+    # every other aspect ratio is cropped from it locally at render time
+    if job.options and job.options.get("master_render") and len(job.aspect_ratios) > 1:
+        master_aspect_ratio = widest_aspect_ratio(job.aspect_ratios)
+        generation_ratios = [master_aspect_ratio]
+        _save_job_metadata(db, job, "master_aspect_ratio", master_aspect_ratio)
+        logger.info(f"Master render mode: generating {master_aspect_ratio} clips only for job {job_id}")
+    else:
+        generation_ratios = list(job.aspect_ratios)
+    
+    shots = storyboard.get("shots", [])
+    done = {(c["shot"], c["aspect_ratio"]) for c in video_clips}
+    pending = [
+        (i, shot, aspect_ratio)
+        for i, shot in enumerate(shots)
+        for aspect_ratio in generation_ratios
+        if (i, aspect_ratio) not in done
+    ]
+    
+    # Normalized copies of the clips, keyed by provider clip URL
+    normalized_clips = job.job_metadata.get("normalized_clips") or {}
+    unnormalized = []
+    if settings.CLIP_NORMALIZATION_ENABLED:
+        unnormalized = [c for c in video_clips if c["url"] not in normalized_clips]
+    
+    if not pending and not unnormalized:
+        logger.info(f"Reusing {len(video_clips)} saved video clips")
+        _set_progress(db, job, 60)
+        return
+    
+    concurrency = settings.get_video_provider_concurrency(video_provider)
+    logger.info(f"Starting {video_provider} video generation for job {job_id}: {len(pending)} clips, up to {concurrency} at a time")
+    
+    total_videos = len(shots) * len(generation_ratios)
+    videos_generated = total_videos - len(pending)
+    semaphore = asyncio.Semaphore(concurrency)
+    normalize_semaphore = asyncio.Semaphore(settings.CLIP_NORMALIZE_MAX_CONCURRENCY)
+    
+    async def normalize_clip(clip: dict):
+        # Normalization is an optimization: on failure the render falls back to the provider clip
+        if not settings.CLIP_NORMALIZATION_ENABLED or clip["url"] in normalized_clips:
+            return
         try:
-            storyboard = await storyboard_service.generate_storyboard(enhanced_images)
-            
-            # Extract selling points from storyboard for later use
-            main_selling_points = storyboard.get("main_selling_points", [])
-            
-            # Update job metadata with storyboard
-            if not job.job_metadata:
-                job.job_metadata = {}
-            job.job_metadata["storyboard"] = storyboard
-            
-            # If we didn't have selling points before, use the ones from storyboard
-            # and enhance images again with annotations
-            if main_selling_points and not any(data.get("annotated_url") for data in enhanced_data):
-                logger.info(f"Re-enhancing images with storyboard selling points")
-                for idx, img_url in enumerate(job.image_urls):
-                    if idx < len(enhanced_data):
-                        try:
-                            enhanced_base = enhanced_data[idx].get("enhanced_url") or img_url
-                            annotated = await enhancement_service.overlay_selling_points(
-                                enhanced_base,
-                                main_selling_points[:3]  # Limit to top 3 selling points
-                            )
-                            enhanced_data[idx]["annotated_url"] = annotated
-                            enhanced_images[idx] = annotated
-                        except Exception as e:
-                            logger.warning(f"Failed to annotate image {idx+1} with selling points: {str(e)}")
-                
-                job.job_metadata["enhancements"] = enhanced_data
-                db.commit()
-            
-            job.progress = 30
-            db.commit()
-            logger.info(f"Successfully generated storyboard for job {job_id}")
+            async with normalize_semaphore:
+                await _normalize_clip(db, job, temp_dir, clip)
         except Exception as e:
-            logger.error(f"Storyboard generation failed for job {job_id}: {str(e)}", exc_info=True)
-            job.error_message = f"Storyboard generation failed: {str(e)}"
-            job.status = JobStatus.FAILED
-            db.commit()
-            raise
-        
-        # Step 3: Generate videos with selected service
-        # Get video service provider from job options (default to seedream)
-        video_provider = job.options.get("video_provider", "seedream") if job.options else "seedream"
-        logger.info(f"Using video provider: {video_provider} for job {job_id}")
-        
-        # Get the appropriate video service
-        if video_provider == "seedream":
-            video_service = SeedreamVideoService()
-        elif video_provider == "openai":
-            video_service = OpenAIVideoService()
-        elif video_provider == "kling":
-            video_service = KlingVideoService()
-        elif video_provider == "veo3":
-            video_service = Veo3VideoService()
-        else:
-            raise Exception(f"Unknown video provider: {video_provider}. Supported providers: seedream, openai, kling, veo3")
-        
-        video_clips = []
-        
-        # Check if videos already exist (from previous run that failed downstream)
-        saved_videos = None
-        if job.job_metadata and "video_clips" in job.job_metadata:
-            saved_videos = job.job_metadata.get("video_clips")
-            logger.info(f"Found saved video clips from previous run. Reusing to avoid wasting credits.")
-        
-        if saved_videos:
-            # Use saved videos - skip generation to save credits
-            video_clips = saved_videos
-            logger.info(f"Reusing {len(video_clips)} saved video clips")
-        else:
-            # Generate new videos
-            logger.info(f"Starting {video_provider} video generation for job {job_id}")
-            
-            total_videos = len(storyboard.get("shots", [])) * len(job.aspect_ratios)
-            videos_generated = 0
-            
-            for i, shot in enumerate(storyboard.get("shots", [])):
-                # Use enhanced image for this shot
-                img_url = enhanced_images[i % len(enhanced_images)]
-                prompt = shot.get("action_instructions", "Smooth product showcase")
-                
-                logger.info(f"Generating video for shot {i+1}/{len(storyboard.get('shots', []))}")
-                
-                # Generate video for each aspect ratio
-                for aspect_ratio in job.aspect_ratios:
-                    try:
-                        logger.info(f"Generating video for shot {i+1}, aspect ratio {aspect_ratio} using {video_provider}")
-                        video_url = await video_service.generate_video(
-                            img_url,
-                            prompt,
-                            aspect_ratio=aspect_ratio
-                        )
-                        video_clips.append({
-                            "shot": i,
-                            "aspect_ratio": aspect_ratio,
-                            "url": video_url,
-                            "duration": shot.get("duration", 5)
-                        })
-                        videos_generated += 1
-                        
-                        # Save video URLs to job_metadata immediately after generation
-                        # This prevents wasting credits if downstream steps fail
-                        if not job.job_metadata:
-                            job.job_metadata = {}
-                        job.job_metadata["video_clips"] = video_clips
-                        db.commit()
-                        logger.info(f"Saved video URL to job metadata (shot {i+1}, {aspect_ratio})")
-                        
-                        # Update progress: 30% to 50% (20% range for video generation)
-                        progress = 30 + int((videos_generated / total_videos) * 20)
-                        job.progress = progress
-                        db.commit()
-                        logger.info(f"Video {videos_generated}/{total_videos} generated. Progress: {progress}%")
-                    except Exception as e:
-                        logger.error(f"Failed to generate video for shot {i+1}, aspect ratio {aspect_ratio}: {str(e)}", exc_info=True)
-                        raise
-            
-            logger.info(f"{video_provider} video generation completed for job {job_id}. Saved {len(video_clips)} video URLs.")
+            logger.warning(f"Failed to normalize clip (shot {clip['shot']+1}, {clip['aspect_ratio']}): {str(e)}")
+            return
+        logger.info(f"Normalized clip (shot {clip['shot']+1}, {clip['aspect_ratio']})")
+    
+    async def generate_clip(i: int, shot: dict, aspect_ratio: str):
+        nonlocal videos_generated
+        # Use enhanced image for this shot
+        img_url = enhanced_images[i % len(enhanced_images)]
+        prompt = shot.get("action_instructions", "Smooth product showcase")
         
-        job.progress = 50
-        db.commit()
+        async with semaphore:
+            logger.info(f"Generating video for shot {i+1}/{len(shots)}, aspect ratio {aspect_ratio} using {video_provider}")
+            try:
+                video_url = await video_service.generate_video(
+                    img_url,
+                    prompt,
+                    aspect_ratio=aspect_ratio
+                )
+            except Exception as e:
+                logger.error(f"Failed to generate video for shot {i+1}, aspect ratio {aspect_ratio}: {str(e)}", exc_info=True)
+                raise
         
-        # Initialize storage service for saving intermediate results
-        storage = StorageService()
+        clip = {
+            "shot": i,
+            "aspect_ratio": aspect_ratio,
+            "url": video_url,
+            "duration": shot.get("duration", 5)
+        }
+        video_clips.append(clip)
+        # Keep clips in timeline order regardless of completion order
+        video_clips.sort(key=lambda c: (c["shot"], c["aspect_ratio"]))
+        videos_generated += 1
         
-        # Step 4: Generate voiceover
-        # Check if voiceover already exists (from previous run that failed downstream)
-        voiceover_path = None
-        if job.job_metadata and "voiceover_saved" in job.job_metadata:
-            # Voiceover was saved in previous run, download it
-            saved_voiceover_url = job.job_metadata.get("voiceover_saved")
-            logger.info(f"Found saved voiceover from previous run. Downloading from {saved_voiceover_url}")
-            voiceover_path = os.path.join(temp_dir, "voiceover.mp3")
-            async with httpx.AsyncClient() as client:
-                response = await client.get(saved_voiceover_url)
-                with open(voiceover_path, "wb") as f:
-                    f.write(response.content)
-            logger.info(f"Reused saved voiceover to avoid wasting credits")
-        else:
-            # Generate new voiceover
-            voice_service = ElevenLabsVoiceService()
-            subtitle_text = " ".join([shot.get("text", "") for shot in storyboard.get("shots", [])])
-            voiceover_audio = await voice_service.generate_voiceover(subtitle_text)
-            
-            # Save voiceover to temp file
-            voiceover_path = os.path.join(temp_dir, "voiceover.mp3")
-            with open(voiceover_path, "wb") as f:
-                f.write(voiceover_audio)
-            
-            # Save voiceover URL to job_metadata immediately after generation
-            # Upload to storage so we can reuse it if downstream fails
-            with open(voiceover_path, "rb") as f:
-                voiceover_url = await storage.upload_file(
-                    f,
-                    f"voiceovers/{job.user_id}/{job.id}.mp3"
-                )
-                if not job.job_metadata:
-                    job.job_metadata = {}
-                job.job_metadata["voiceover_saved"] = voiceover_url
-                db.commit()
-                logger.info(f"Saved voiceover URL to job metadata to avoid re-generating if downstream fails")
+        # Save video URLs to job_metadata immediately after generation
+        # This prevents wasting credits if downstream steps fail
+        _save_job_metadata(db, job, "video_clips", video_clips)
+        logger.info(f"Saved video URL to job metadata (shot {i+1}, {aspect_ratio})")
         
-        job.progress = 60
-        db.commit()
+        # Update progress: 30% to 60% (30% range for video generation)
+        progress = 30 + int((videos_generated / total_videos) * 30)
+        _set_progress(db, job, progress)
+        logger.info(f"Video {videos_generated}/{total_videos} generated. Progress: {progress}%")
         
-        # Step 5: Select music
+        # Normalize while the remaining clips are still generating
+        await normalize_clip(clip)
+    
+    # Let every in-flight clip finish (and checkpoint) before surfacing a failure,
+    # so a retry only has to pay for the clips that actually failed
+    results = await asyncio.gather(
+        *(generate_clip(i, shot, aspect_ratio) for i, shot, aspect_ratio in pending),
+        *(normalize_clip(clip) for clip in unnormalized),
+        return_exceptions=True
+    )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        raise errors[0]
+    
+    logger.info(f"{video_provider} video generation completed for job {job_id}. Saved {len(video_clips)} video URLs.")
+    _set_progress(db, job, 60)
+
+
+async def _normalize_clip(db, job: Job, temp_dir: str, clip: dict) -> str:
+    """Download a provider clip, conform it to the mezzanine format, upload and record the result"""
+    name = f"{clip['shot']}_{clip['aspect_ratio'].replace(':', 'x')}"
+    source_path = os.path.join(temp_dir, f"raw_{name}.mp4")
+    await DownloadService().download_to_file(clip["url"], source_path)
+    
+    processor = VideoProcessor()
+    try:
+        normalized_path = os.path.join(processor.temp_dir, f"normalized_{name}.mp4")
+        # At the job's render size, so renders of this aspect ratio can stream-copy it
+        await processor.normalize_clip(
+            source_path,
+            normalized_path,
+            render_dimensions(clip["aspect_ratio"], _render_profile(job))
+        )
+        return await _store_job_file(
+            StorageService(),
+            normalized_path,
+            f"clips/{job.user_id}/{job.id}/{name}.mp4",
+            lambda url: _merge_job_metadata(db, job, "normalized_clips", {clip["url"]: url})
+        )
+    finally:
+        processor.cleanup()
+        if os.path.exists(source_path):
+            os.remove(source_path)
+
+
+async def _generate_voiceover_async(db, job: Job, temp_dir: str):
+    """Stage 3b: Generate voiceover and save it to storage (runs alongside clip generation)"""
+    job_id = str(job.id)
+    # Check if voiceover already exists (from previous run that failed downstream)
+    if "voiceover_saved" in job.job_metadata:
+        logger.info(f"Found saved voiceover for job {job_id}. Reusing to avoid wasting credits")
+        return
+    
+    storyboard = job.job_metadata["storyboard"]
+    voice_service = ElevenLabsVoiceService()
+    subtitle_text = " ".join([shot.get("text", "") for shot in storyboard.get("shots", [])])
+    voiceover_audio = await voice_service.generate_voiceover(subtitle_text)
+    
+    # Save voiceover to temp file
+    voiceover_path = os.path.join(temp_dir, "voiceover.mp3")
+    with open(voiceover_path, "wb") as f:
+        f.write(voiceover_audio)
+    
+    # Save voiceover URL to job_metadata immediately after generation
+    # Upload to storage so we can reuse it if downstream fails
+    await _store_job_file(
+        StorageService(),
+        voiceover_path,
+        f"voiceovers/{job.user_id}/{job.id}.mp3",
+        lambda url: _save_job_metadata(db, job, "voiceover_saved", url)
+    )
+    logger.info(f"Saved voiceover URL to job metadata to avoid re-generating if downstream fails")
+
+
+async def _select_music_async(db, job: Job, temp_dir: str):
+    """Stage 3c: Select music (runs alongside clip generation)"""
+    if "music" not in job.job_metadata:
+        storyboard = job.job_metadata["storyboard"]
         music_selector = MusicSelector()
         music = music_selector.select_music(
             style=storyboard.get("music_style", "energetic"),
             duration=storyboard.get("total_duration", 30)
         )
+        _save_job_metadata(db, job, "music", music)
+
+
+async def _mix_audio_async(db, job: Job, temp_dir: str):
+    """
+    Stage 3d: Mix the job's audio bed once (voiceover + ducked music, loudness-normalized)
+    for every aspect ratio to mux with stream copy. Cached in job_metadata["audio_mix"] by
+    (voiceover, track, duration); best effort, renders mix live without it.
+    """
+    job_id = str(job.id)
+    voiceover_url = job.job_metadata["voiceover_saved"]
+    music = job.job_metadata.get("music") or {}
+    shots = job.job_metadata["storyboard"].get("shots", [])
+    duration = sum(shot.get("duration", 5) for shot in shots) + settings.AUDIO_MIX_TAIL
+    key = hashlib.sha256(f"{voiceover_url}|{music.get('url')}|{duration}".encode()).hexdigest()
+    
+    audio_mix = job.job_metadata.get("audio_mix") or {}
+    if audio_mix.get("key") == key:
+        logger.info(f"Reusing saved audio mix for job {job_id}")
+        return
+    
+    processor = VideoProcessor()
+    try:
+        voiceover_path = os.path.join(temp_dir, "voiceover.mp3")
+        await DownloadService().download_to_file(voiceover_url, voiceover_path)
         
-        job.progress = 70
-        db.commit()
+        mix_path = os.path.join(temp_dir, "audio_mix.m4a")
+        await processor.premix_audio(voiceover_path, mix_path, music.get("url"), duration)
+        _save_encode_stats(db, job, "audio_mix", processor)
         
-        # Step 6: Process videos for each aspect ratio
-        final_videos = {}
+        # Supersedes the mix of an earlier voiceover/track, if any
+        await _store_job_file(
+            StorageService(),
+            mix_path,
+            f"audio/{job.user_id}/{job.id}/mix_{key[:12]}.m4a",
+            lambda url: _save_job_metadata(db, job, "audio_mix", {"key": key, "url": url, "duration": duration}),
+            replaces=audio_mix.get("url")
+        )
+    except Exception as e:
+        logger.warning(f"Failed to mix audio for job {job_id}, renders will mix it themselves: {str(e)}")
+        return
+    finally:
+        processor.cleanup()
+    
+    logger.info(f"Saved {duration}s audio mix for job {job_id}")
+
+
+async def _join_media_async(db, job: Job, temp_dir: str):
+    """Stage 4: Join the clip, voiceover and music branches before rendering"""
+    missing = [key for key in ("video_clips", "voiceover_saved", "music") if key not in job.job_metadata]
+    if missing:
+        raise Exception(f"Cannot render job {job.id}: missing {', '.join(missing)}")
+    
+    _set_progress(db, job, 70)
+
+
+async def _render_aspect_ratio_async(db, job: Job, temp_dir: str, aspect_ratio: str) -> str:
+    """Stage 5: Render, upload and record the final video for one aspect ratio"""
+    job_id = str(job.id)
+    renders = job.job_metadata.get("renders") or {}
+    if aspect_ratio in renders:
+        logger.info(f"Reusing saved {aspect_ratio} render for job {job_id}")
+        return renders[aspect_ratio]
+    
+    storyboard = job.job_metadata["storyboard"]
+    music = job.job_metadata.get("music") or {}
+    processor = VideoProcessor()
+    storyboard_service = StoryboardService()
+    storage = StorageService()
+    
+    try:
+        clips_for_ratio, from_master = _clips_for_aspect_ratio(job, aspect_ratio)
+        voiceover_path, mix_path, clip_paths = await _download_render_inputs(job, temp_dir, clips_for_ratio)
         
-        for aspect_ratio in job.aspect_ratios:
-            # Get clips for this aspect ratio
-            clips_for_ratio = [c for c in video_clips if c["aspect_ratio"] == aspect_ratio]
-            clip_urls = [c["url"] for c in clips_for_ratio]
-            
-            # Download clips
-            clip_paths = []
-            async with httpx.AsyncClient() as client:
-                for clip_url in clip_urls:
-                    clip_path = os.path.join(temp_dir, f"clip_{len(clip_paths)}.mp4")
-                    response = await client.get(clip_url)
-                    with open(clip_path, "wb") as f:
-                        f.write(response.content)
-                    clip_paths.append(clip_path)
-            
-            # Combine clips
-            combined_path = os.path.join(temp_dir, f"combined_{aspect_ratio}.mp4")
-            processor.combine_clips(clip_paths, combined_path)
-            
-            # Add subtitles
-            subtitles = storyboard_service.generate_subtitles(storyboard)
-            subtitled_path = os.path.join(temp_dir, f"subtitled_{aspect_ratio}.mp4")
-            processor.add_subtitles(combined_path, subtitles, subtitled_path)
-            
-            # Add audio (voiceover + music)
-            final_path = os.path.join(temp_dir, f"final_{aspect_ratio}.mp4")
-            processor.add_audio(subtitled_path, voiceover_path, final_path, music.get("url"))
-            
-            # Resize to exact aspect ratio
-            resized_path = os.path.join(temp_dir, f"resized_{aspect_ratio}.mp4")
-            processor.resize_video(final_path, resized_path, aspect_ratio)
-            
-            # Upload to S3
-            with open(resized_path, "rb") as f:
-                video_url = await storage.upload_file(
-                    f,
-                    f"videos/{job.user_id}/{job.id}/{aspect_ratio}.mp4"
-                )
-                final_videos[aspect_ratio] = video_url
+        # The job thumbnail comes from the first aspect ratio's render, written by the same pass
+        thumbnail_path = None
+        if aspect_ratio == job.aspect_ratios[0]:
+            thumbnail_path = os.path.join(temp_dir, "thumbnail.jpg")
         
-        job.progress = 90
-        db.commit()
+        # Concat, reframe, subtitles, audio mix and resize in one encode
+        subtitles = storyboard_service.generate_subtitles(storyboard)
+        final_path = os.path.join(temp_dir, f"final_{aspect_ratio}.mp4")
+        # This ratio's share of the 70-90% render range
+        share = 20 / len(job.aspect_ratios)
+        start = 70 + int(len(job.job_metadata.get("renders") or {}) * share)
+        await processor.render(
+            clip_paths,
+            final_path,
+            aspect_ratio,
+            subtitles=subtitles,
+            voiceover_path=voiceover_path,
+            music_path=music.get("url"),
+            crop_to_aspect_ratio=from_master,
+            thumbnail_path=thumbnail_path,
+            representative_thumbnail=_thumbnail_mode(job) == "representative",
+            profile=_render_profile(job),
+            on_progress=_encode_progress(db, job, start, start + int(share)),
+            premixed_audio_path=mix_path,
+            subtitle_mode=_subtitle_mode(job),
+            beats=await _music_beats(job),
+            transitions=_transitions(job, storyboard)
+        )
+        _save_encode_stats(db, job, aspect_ratio, processor)
         
-        # Step 7: Generate thumbnail
-        thumbnail_path = os.path.join(temp_dir, "thumbnail.jpg")
-        import ffmpeg
-        if final_videos:
-            first_video_url = list(final_videos.values())[0]
-            # Download video for thumbnail extraction
-            async with httpx.AsyncClient() as client:
-                response = await client.get(first_video_url)
-                temp_video = os.path.join(temp_dir, "temp_video.mp4")
-                with open(temp_video, "wb") as f:
-                    f.write(response.content)
-            
-            stream = ffmpeg.input(temp_video)
-            stream = ffmpeg.output(stream, thumbnail_path, vframes=1)
-            ffmpeg.run(stream, overwrite_output=True, quiet=True)
-            
-            with open(thumbnail_path, "rb") as f:
-                thumbnail_url = await storage.upload_file(
-                    f,
-                    f"thumbnails/{job.user_id}/{job.id}.jpg"
-                )
-        else:
-            thumbnail_url = None
+        return await _publish_render(db, job, storage, aspect_ratio, final_path, thumbnail_path)
+    finally:
+        processor.cleanup()
+
+
+async def _render_preview_async(db, job: Job, temp_dir: str):
+    """
+    Stage 5 (alongside the final renders): publish a fast low-res preview of the first
+    aspect ratio to job.preview_url so users can watch before the job completes
+    """
+    job_id = str(job.id)
+    if job.preview_url:
+        logger.info(f"Reusing saved preview for job {job_id}")
+        return
+    if _render_profile(job) != "final":
+        # The job's own renders are already preview speed
+        return
+    
+    aspect_ratio = job.aspect_ratios[0]
+    music = job.job_metadata.get("music") or {}
+    processor = VideoProcessor()
+    
+    try:
+        clips, from_master = _clips_for_aspect_ratio(job, aspect_ratio)
+        voiceover_path, mix_path, clip_paths = await _download_render_inputs(job, temp_dir, clips)
         
-        # Update job
-        job.status = JobStatus.COMPLETED
-        job.progress = 100
-        job.video_urls = final_videos
-        job.thumbnail_url = thumbnail_url
-        job.completed_at = datetime.utcnow()
-        db.commit()
+        preview_path = os.path.join(temp_dir, f"preview_{aspect_ratio}.mp4")
+        await processor.render(
+            clip_paths,
+            preview_path,
+            aspect_ratio,
+            subtitles=StoryboardService().generate_subtitles(job.job_metadata["storyboard"]),
+            voiceover_path=voiceover_path,
+            music_path=music.get("url"),
+            crop_to_aspect_ratio=from_master,
+            profile=settings.PREVIEW_RENDER_PROFILE,
+            premixed_audio_path=mix_path,
+            subtitle_mode=_subtitle_mode(job),
+            beats=await _music_beats(job),
+            transitions=_transitions(job, job.job_metadata["storyboard"])
+        )
+        _save_encode_stats(db, job, "preview", processor)
         
-    except Exception as e:
-        if 'job' in locals():
-            job.status = JobStatus.FAILED
-            job.error_message = str(e)
+        def record(url: str):
+            job.preview_url = url
             db.commit()
-        raise
+        
+        await _store_job_file(
+            StorageService(),
+            preview_path,
+            f"previews/{job.user_id}/{job.id}/{aspect_ratio}.mp4",
+            record
+        )
+    except Exception as e:
+        # Best effort: the final renders still complete the job without a preview
+        logger.warning(f"Failed to render preview for job {job_id}: {str(e)}")
+        return
+    finally:
+        processor.cleanup()
+    
+    logger.info(f"Published {aspect_ratio} preview for job {job_id}")
+
+
+async def _render_all_aspect_ratios_async(db, job: Job, temp_dir: str) -> dict:
+    """
+    Stage 5 (master render mode): render every aspect ratio from the master clips in one
+    ffmpeg process, decoding the timeline once and encoding a branch per ratio
+    """
+    job_id = str(job.id)
+    renders = job.job_metadata.get("renders") or {}
+    pending = [ratio for ratio in job.aspect_ratios if ratio not in renders]
+    if not pending:
+        logger.info(f"Reusing saved renders for job {job_id}")
+        return renders
+    
+    storyboard = job.job_metadata["storyboard"]
+    master_aspect_ratio = job.job_metadata["master_aspect_ratio"]
+    master_clips = [c for c in job.job_metadata["video_clips"] if c["aspect_ratio"] == master_aspect_ratio]
+    music = job.job_metadata.get("music") or {}
+    processor = VideoProcessor()
+    storage = StorageService()
+    
+    try:
+        voiceover_path, mix_path, clip_paths = await _download_render_inputs(job, temp_dir, master_clips)
+        
+        # The thumbnail is taken from the first output, which is the job's first aspect ratio if pending
+        thumbnail_path = None
+        if pending[0] == job.aspect_ratios[0]:
+            thumbnail_path = os.path.join(temp_dir, "thumbnail.jpg")
+        
+        output_paths = {ratio: os.path.join(temp_dir, f"final_{ratio}.mp4") for ratio in pending}
+        logger.info(f"Rendering {', '.join(pending)} from {master_aspect_ratio} master clips for job {job_id}")
+        await processor.render_multi(
+            clip_paths,
+            output_paths,
+            master_aspect_ratio,
+            subtitles=StoryboardService().generate_subtitles(storyboard),
+            voiceover_path=voiceover_path,
+            music_path=music.get("url"),
+            thumbnail_path=thumbnail_path,
+            representative_thumbnail=_thumbnail_mode(job) == "representative",
+            profile=_render_profile(job),
+            on_progress=_encode_progress(db, job, 70, 90),
+            premixed_audio_path=mix_path,
+            subtitle_mode=_subtitle_mode(job),
+            beats=await _music_beats(job),
+            transitions=_transitions(job, storyboard)
+        )
+        _save_encode_stats(db, job, "all", processor)
+        
+        for ratio, output_path in output_paths.items():
+            await _publish_render(
+                db, job, storage, ratio, output_path,
+                thumbnail_path if ratio == job.aspect_ratios[0] else None
+            )
     finally:
-        # Cleanup
         processor.cleanup()
-        import shutil
+    
+    return job.job_metadata.get("renders") or {}
+
+
+def _clips_for_aspect_ratio(job: Job, aspect_ratio: str):
+    """
+    Clips to render an aspect ratio from, and whether they are master clips that
+    have to be cropped to it
+    """
+    video_clips = job.job_metadata["video_clips"]
+    clips = [c for c in video_clips if c["aspect_ratio"] == aspect_ratio]
+    master_aspect_ratio = job.job_metadata.get("master_aspect_ratio")
+    if not clips and master_aspect_ratio:
+        # Master render mode: derive this ratio from the master clips
+        return [c for c in video_clips if c["aspect_ratio"] == master_aspect_ratio], True
+    return clips, False
+
+
+async def _download_render_inputs(job: Job, temp_dir: str, clips: list):
+    """
+    Stream the voiceover, the job's audio mix (when mix_audio saved one; otherwise the
+    mix path is None) and the given clips to disk concurrently
+    """
+    # Prefer the normalized mezzanine copy of each clip when there is one
+    normalized_clips = job.job_metadata.get("normalized_clips") or {}
+    voiceover_path = os.path.join(temp_dir, "voiceover.mp3")
+    downloads = [(job.job_metadata["voiceover_saved"], voiceover_path)]
+    audio_mix = job.job_metadata.get("audio_mix")
+    mix_path = os.path.join(temp_dir, "audio_mix.m4a") if audio_mix else None
+    if audio_mix:
+        downloads.append((audio_mix["url"], mix_path))
+    clip_downloads = [
+        (normalized_clips.get(clip["url"], clip["url"]), os.path.join(temp_dir, f"clip_{i}.mp4"))
+        for i, clip in enumerate(clips)
+    ]
+    local_paths = await DownloadService().download_all(downloads + clip_downloads)
+    return voiceover_path, mix_path, local_paths[len(downloads):]
+
+
+async def _publish_render(
+    db,
+    job: Job,
+    storage: StorageService,
+    aspect_ratio: str,
+    video_path: str,
+    thumbnail_path: Optional[str] = None
+) -> str:
+    """Upload one rendered aspect ratio (and the job thumbnail) and record it"""
+    # Thumbnail first: once the render is recorded the stage won't run again to retry it.
+    # A thumbnail from an earlier attempt whose render upload failed is superseded
+    if thumbnail_path:
+        await _store_job_file(
+            storage,
+            thumbnail_path,
+            f"thumbnails/{job.user_id}/{job.id}.jpg",
+            lambda url: _save_job_metadata(db, job, "thumbnail_url", url),
+            replaces=job.job_metadata.get("thumbnail_url")
+        )
+    
+    # Upload to S3
+    video_url = await _store_job_file(
+        storage,
+        video_path,
+        f"videos/{job.user_id}/{job.id}/{aspect_ratio}.mp4",
+        lambda url: _merge_job_metadata(db, job, "renders", {aspect_ratio: url})
+    )
+    
+    # Update progress: 70% to 90% as each aspect ratio finishes
+    renders = job.job_metadata.get("renders") or {}
+    _set_progress(db, job, 70 + int(len(renders) / len(job.aspect_ratios) * 20))
+    return video_url
+
+
+async def _finalize_job_async(db, job: Job, temp_dir: str):
+    """Stage 6: Mark the job completed with its renders and thumbnail"""
+    renders = job.job_metadata.get("renders") or {}
+    final_videos = {ratio: renders[ratio] for ratio in job.aspect_ratios if ratio in renders}
+    # Thumbnail was extracted from the local render by the first aspect ratio's render stage
+    thumbnail_url = job.job_metadata.get("thumbnail_url") if final_videos else None
+    
+    # Update job
+    job.status = JobStatus.COMPLETED
+    job.progress = 100
+    job.video_urls = final_videos
+    job.thumbnail_url = thumbnail_url
+    job.completed_at = datetime.utcnow()
+    db.commit()
+
+
+async def _run_stage_async(job_id: str, stage_fn, *args):
+    """Load the job, run one pipeline stage against it and clean up after it"""
+    db = SessionLocal()
+    temp_dir = tempfile.mkdtemp()
+    try:
+        job = db.query(Job).filter(Job.id == UUID(job_id)).first()
+        if not job:
+            raise Exception(f"Job {job_id} not found")
+        return await stage_fn(db, job, temp_dir, *args)
+    finally:
+        # Cleanup
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
         db.close()
 
 
+def _mark_job_failed(job_id: str, error_message: str):
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == UUID(job_id)).first()
+        if job:
+            job.status = JobStatus.FAILED
+            job.error_message = error_message
+            db.commit()
+    finally:
+        db.close()
+
+
+def _run_stage(task, stage: str, job_id: str, stage_fn, *args):
+    """
+    Run a stage inside a Celery task. Stages persist their outputs to job_metadata
+    and skip work that is already there, so a failed stage is retried on its own
+    without redoing (or re-paying for) the stages before it.
+    """
+    logger.info(f"Stage {stage} started for job_id: {job_id}")
+    try:
+        result = _run_async(_run_stage_async(job_id, stage_fn, *args))
+    except Exception as e:
+        if task.request.retries < task.max_retries:
+            logger.warning(f"Stage {stage} failed for job_id: {job_id}, retrying: {str(e)}")
+            raise task.retry(exc=e, countdown=settings.PIPELINE_STAGE_RETRY_DELAY)
+        logger.error(f"Stage {stage} failed for job_id: {job_id}, error: {str(e)}", exc_info=True)
+        _mark_job_failed(job_id, str(e))
+        raise
+    logger.info(f"Stage {stage} completed for job_id: {job_id}")
+    return result
+
+
+@celery_app.task(bind=True, max_retries=settings.PIPELINE_STAGE_MAX_RETRIES)
+def enhance_images_stage(self, job_id: str):
+    _run_stage(self, "enhance_images", job_id, _enhance_images_async)
+
+
+@celery_app.task(bind=True, max_retries=settings.PIPELINE_STAGE_MAX_RETRIES)
+def generate_storyboard_stage(self, job_id: str):
+    _run_stage(self, "generate_storyboard", job_id, _generate_storyboard_async)
+
+
+@celery_app.task(bind=True, max_retries=settings.PIPELINE_STAGE_MAX_RETRIES)
+def generate_clips_stage(self, job_id: str):
+    _run_stage(self, "generate_clips", job_id, _generate_clips_async)
+
+
+@celery_app.task(bind=True, max_retries=settings.PIPELINE_STAGE_MAX_RETRIES)
+def generate_voiceover_stage(self, job_id: str):
+    _run_stage(self, "generate_voiceover", job_id, _generate_voiceover_async)
+
+
+@celery_app.task(bind=True, max_retries=settings.PIPELINE_STAGE_MAX_RETRIES)
+def select_music_stage(self, job_id: str):
+    _run_stage(self, "select_music", job_id, _select_music_async)
+
+
+@celery_app.task(bind=True, max_retries=settings.PIPELINE_STAGE_MAX_RETRIES)
+def mix_audio_stage(self, job_id: str):
+    _run_stage(self, "mix_audio", job_id, _mix_audio_async)
+
+
+@celery_app.task(bind=True, max_retries=settings.PIPELINE_STAGE_MAX_RETRIES)
+def join_media_stage(self, job_id: str):
+    _run_stage(self, "join_media", job_id, _join_media_async)
+
+
+@celery_app.task(bind=True, max_retries=settings.PIPELINE_STAGE_MAX_RETRIES)
+def render_aspect_ratio_stage(self, job_id: str, aspect_ratio: str) -> str:
+    return _run_stage(self, f"render_{aspect_ratio}", job_id, _render_aspect_ratio_async, aspect_ratio)
+
+
+@celery_app.task(bind=True, max_retries=settings.PIPELINE_STAGE_MAX_RETRIES)
+def render_preview_stage(self, job_id: str):
+    _run_stage(self, "render_preview", job_id, _render_preview_async)
+
+
+@celery_app.task(bind=True, max_retries=settings.PIPELINE_STAGE_MAX_RETRIES)
+def render_all_aspect_ratios_stage(self, job_id: str) -> dict:
+    return _run_stage(self, "render_all", job_id, _render_all_aspect_ratios_async)
+
+
+@celery_app.task(bind=True, max_retries=settings.PIPELINE_STAGE_MAX_RETRIES)
+def finalize_job_stage(self, job_id: str):
+    _run_stage(self, "finalize", job_id, _finalize_job_async)
+
+
+def build_video_pipeline(job_id: str, aspect_ratios: list, multi_output: bool = False):
+    """
+    Build the stage DAG for a job:
+    enhance -> storyboard -> [clips | voiceover -> music -> audio mix] -> join -> [preview | render per aspect ratio] -> finalize
+    multi_output: render every aspect ratio in one task/ffmpeg process (master render mode,
+    where all ratios share the same clips)
+    """
+    if multi_output:
+        renders = [render_all_aspect_ratios_stage.si(job_id)]
+    else:
+        renders = [render_aspect_ratio_stage.si(job_id, aspect_ratio) for aspect_ratio in aspect_ratios]
+    if settings.PREVIEW_ENABLED:
+        # Queued ahead of the final renders so it is picked up first
+        renders.insert(0, render_preview_stage.si(job_id))
+    render = chord(group(renders), finalize_job_stage.si(job_id))
+        
+    return chain(
+        enhance_images_stage.si(job_id),
+        generate_storyboard_stage.si(job_id),
+        # Voiceover, music and the audio mix only depend on the storyboard, so they
+        # run alongside clip generation instead of after it
+        chord(
+            group(
+                generate_clips_stage.si(job_id),
+                chain(
+                    generate_voiceover_stage.si(job_id),
+                    select_music_stage.si(job_id),
+                    mix_audio_stage.si(job_id)
+                )
+            ),
+            join_media_stage.si(job_id)
+        ),
+        render
+    )
+
+
 @celery_app.task(bind=True, max_retries=0)
 def process_video_job(self, job_id: str):
     """
     Main video generation workflow (Celery task wrapper)
+    Marks the job as processing and dispatches the stage DAG
     """
     logger.info(f"Celery task process_video_job started for job_id: {job_id}")
+    db = SessionLocal()
     try:
-        asyncio.run(_process_video_job_async(job_id))
-        logger.info(f"Celery task process_video_job completed for job_id: {job_id}")
+        job = db.query(Job).filter(Job.id == UUID(job_id)).first()
+        if not job:
+            raise Exception(f"Job {job_id} not found")
+        
+        job.status = JobStatus.PROCESSING
+        job.error_message = None
+        job.progress = max(job.progress or 0, 10)
+        db.commit()
+        
+        # Master render mode generates one clip set, so all ratios can come from one decode
+        multi_output = bool(job.options and job.options.get("master_render")) and len(job.aspect_ratios) > 1
+        result = build_video_pipeline(job_id, list(job.aspect_ratios), multi_output).apply_async()
+        logger.info(f"Celery task process_video_job dispatched pipeline for job_id: {job_id}, root task ID: {result.id}")
     except Exception as e:
         logger.error(f"Celery task process_video_job failed for job_id: {job_id}, error: {str(e)}", exc_info=True)
         # Don't retry - let the job fail and user can retry manually
+        if 'job' in locals() and job:
+            job.status = JobStatus.FAILED
+            job.error_message = str(e)
+            db.commit()
         raise
-
+    finally:
+        db.close()
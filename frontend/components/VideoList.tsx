@@ -11,6 +11,7 @@ interface Job {
   progress: number
   image_urls?: string[] | null
   video_urls: Record<string, string> | null
+  preview_url?: string | null
   thumbnail_url: string | null
   error_message: string | null
   job_metadata?: {
@@ -163,6 +164,21 @@ export default function VideoList() {
               </div>
             )}
 
+            {/* Show the low-res preview until the final renders are ready */}
+            {job.status === 'processing' && job.preview_url && (
+              <div className="mb-4 p-3 bg-green-50 rounded-lg border border-green-200">
+                <p className="text-sm font-medium mb-2 text-green-800">
+                  👀 Preview (final quality still rendering)
+                </p>
+                <ReactPlayer
+                  url={job.preview_url}
+                  controls
+                  width="100%"
+                  height="auto"
+                />
+              </div>
+            )}
+
             {job.status === 'completed' && job.video_urls && (
               <div className="space-y-4 mt-4">
                 {Object.entries(job.video_urls).map(([ratio, url]) => (